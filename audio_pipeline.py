@@ -0,0 +1,161 @@
+# audio_pipeline.py
+# Audio fast path: audio-only stream selection, output extension, and
+# two-pass loudnorm with first-pass measurements cached per file
+
+import json
+import os
+import re
+import subprocess
+import threading
+
+from config import FFMPEG_PATH, LOUDNORM_CACHE_FILE, HELPER_TIMEOUT_SECS
+from ffmpeg_args import split_args, join_args, get_opt, has_opt, video_codec, audio_codec
+from file_manager import file_fingerprint, probe_media
+
+# Output extension for audio-only results, by audio encoder
+AUDIO_EXTS = {"aac": ".m4a", "libfdk_aac": ".m4a", "libmp3lame": ".mp3",
+              "libopus": ".opus", "flac": ".flac"}
+
+# loudnorm's own defaults, used when a preset doesn't set a target
+LOUDNORM_DEFAULTS = {"I": "-24", "TP": "-2", "LRA": "7"}
+
+MEASURED_KEYS = ("input_i", "input_tp", "input_lra", "input_thresh")
+LOUDNORM_JSON_RE = re.compile(r"\{[^{}]*\"input_i\"[^{}]*\}", re.S)
+
+_cache_lock = threading.Lock()
+_cache = None
+
+
+def is_audio_job(args):
+    """Audio-only output, or video passed through untouched with audio work."""
+    vcodec = video_codec(args)
+    if vcodec == "none":
+        return True
+    return vcodec == "copy" and audio_codec(args) not in (None, "copy")
+
+
+def is_audio_only(args):
+    """No video output at all (-vn): light enough for the wide audio pool."""
+    return video_codec(args) == "none"
+
+
+def output_ext(args):
+    if video_codec(args) != "none":
+        return ".mp4"
+    return AUDIO_EXTS.get(audio_codec(args), ".mka")
+
+
+def _loudnorm_filter(args):
+    af = get_opt(args, "-af") or ""
+    for f in af.split(","):
+        if f.strip().startswith("loudnorm"):
+            return f.strip()
+    return None
+
+
+def _loudnorm_target(flt):
+    target = dict(LOUDNORM_DEFAULTS)
+    _, _, params = flt.partition("=")
+    for p in params.split(":"):
+        k, _, v = p.partition("=")
+        if k in ("I", "i", "TP", "tp", "LRA", "lra") and v:
+            target[k.upper()] = v
+    return target
+
+
+# ---------------- LOUDNORM MEASUREMENT ----------------
+# The cache file is read once per process and rewritten atomically per new entry
+
+def _load_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                with open(LOUDNORM_CACHE_FILE, "r", encoding="utf-8") as f:
+                    _cache = json.load(f)
+            except (OSError, ValueError):
+                _cache = {}
+        return _cache
+
+
+def _save_entry(fp, measured):
+    data = _load_cache()
+    with _cache_lock:
+        data[fp] = measured
+        tmp = LOUDNORM_CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, LOUDNORM_CACHE_FILE)
+
+
+def measure_loudness(path):
+    """First loudnorm pass (input stats only, target independent). Cached per fingerprint."""
+    fp = file_fingerprint(path)
+    cached = _load_cache().get(fp) if fp else None
+    if cached:
+        return cached
+
+    # Audio-only decode runs far faster than realtime; 1x is a generous bound
+    timeout = HELPER_TIMEOUT_SECS + (probe_media(path).get("duration") or 0)
+    try:
+        r = subprocess.run([
+            FFMPEG_PATH, "-hide_banner", "-nostats", "-i", path,
+            "-vn", "-sn", "-dn", "-map", "0:a:0",
+            "-af", "loudnorm=print_format=json", "-f", "null", "-"
+        ], capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    m = LOUDNORM_JSON_RE.search(r.stderr)
+    if r.returncode != 0 or not m:
+        return None
+
+    stats = json.loads(m.group(0))
+    measured = {k: stats[k] for k in MEASURED_KEYS}
+    if fp:
+        _save_entry(fp, measured)
+    return measured
+
+
+def _normalized_filter(flt, measured):
+    t = _loudnorm_target(flt)
+    return (f"loudnorm=I={t['I']}:TP={t['TP']}:LRA={t['LRA']}"
+            f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+            f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+            f":linear=true")
+
+
+# ---------------- ARGS ----------------
+
+def select_audio_streams(args):
+    """Explicit stream selection for an audio job (the part of prepare_audio_args
+    that doesn't depend on the file).
+
+    Only the first audio track is mapped: it is the one loudnorm is measured
+    on, and the trailing ? lets sources without audio fail cleanly in FFmpeg.
+    """
+    if has_opt(args, "-map"):
+        return args
+    if is_audio_only(args):
+        return "-map 0:a:0? " + args
+    return "-map 0:v? -map 0:a:0? " + args
+
+
+def needs_loudness(args):
+    """True when prepare_audio_args will measure the file and rewrite loudnorm."""
+    flt = _loudnorm_filter(args)
+    return bool(flt) and "measured_I" not in flt
+
+
+def prepare_audio_args(path, args, log=None):
+    """Add audio stream selection and swap single-pass loudnorm for a measured one."""
+    args = select_audio_streams(args)
+
+    flt = _loudnorm_filter(args)
+    if needs_loudness(args):
+        measured = measure_loudness(path)
+        if measured:
+            af = get_opt(args, "-af").replace(flt, _normalized_filter(flt, measured))
+            args = join_args([(o, af if o == "-af" else v) for o, v in split_args(args)])
+        elif log:
+            log("loudnorm measurement failed, using single pass")
+    return args
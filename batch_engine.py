@@ -0,0 +1,369 @@
+# batch_engine.py
+# Batch engine: pools of worker threads pulling jobs from JobQueues
+# Probe -> route -> run_ffmpeg for each job, reporting back through callbacks
+# Audio-only (-vn) jobs get their own queue and a wider pool, since they are
+# light; video-copy jobs with audio work stay in the main pool (they move
+# whole video streams through the disk)
+# Events go to the callbacks and, when given, to an EventBus (tagged with source)
+# FFmpeg runs are supervised (stall / timeout kill) and video jobs are retried
+# once with the fallback preset when the failure looks input-related; a job
+# that only succeeded that way finishes as "done (fallback)"
+
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+
+from audio_pipeline import is_audio_job, is_audio_only, prepare_audio_args
+from dedup import link_or_copy
+from estimations import record_job_stats
+from config import AUDIO_WORKERS, MAX_JOB_RECORDS, FALLBACK_PRESET
+from job_queue import JobQueue
+from file_manager import probe_media
+from ffmpeg_runner import run_ffmpeg
+from ffmpeg_args import set_opt
+from quality_analysis import quality_opt, select_crf
+from plugins import load_plugin
+from routing import route_job
+from supervisor import watchdog, time_budget, classify, fallback_args, should_retry
+from twopass import run_two_pass
+
+
+class BatchEngine:
+    def __init__(self, workers=1, policy="fifo", smart_copy=True, audio_workers=AUDIO_WORKERS,
+                 on_log=None, on_progress=None, on_job_start=None, on_job_done=None,
+                 on_finished=None, bus=None, source="batch"):
+        self.workers = max(1, int(workers))
+        self.audio_workers = max(1, int(audio_workers or os.cpu_count() or 2))
+        self.queue = JobQueue(policy)
+        self.audio_queue = JobQueue(policy)
+        self.smart_copy = smart_copy
+
+        self.on_log = on_log
+        self.on_progress = on_progress
+        self.on_job_start = on_job_start
+        self.on_job_done = on_job_done
+        self.on_finished = on_finished
+        self.bus = bus
+        self.source = source
+
+        self.active_processes = []
+        # Finished jobs are kept as small (path, status, returncode) tuples,
+        # only the most recent ones; counts cover the whole batch
+        self.finished = deque(maxlen=MAX_JOB_RECORDS)
+        self.counts = {}
+        self.running = False
+        self._threads = []
+        self._lock = threading.Lock()
+        # Jobs submitted without a duration, probed in the background so
+        # cost ordering works without holding up the first encode
+        self._unprobed = queue.Queue()
+
+    # ---------- CONTROL ----------
+
+    def submit(self, job):
+        try:
+            light = is_audio_only(job.args)
+        except ValueError:
+            # Malformed args (unbalanced quotes) fail in the worker like any job error
+            light = False
+        if not job.duration:
+            self._unprobed.put(job)
+        if light:
+            self.audio_queue.push(job)
+        else:
+            self.queue.push(job)
+
+    def start(self):
+        self.running = True
+        pools = [(self.queue, self.workers), (self.audio_queue, self.audio_workers)]
+        with self._lock:
+            for q, n in pools:
+                for _ in range(n):
+                    t = threading.Thread(target=self._worker, args=(q,), daemon=True)
+                    self._threads.append(t)
+                    t.start()
+        threading.Thread(target=self._prober, daemon=True).start()
+
+    def finish(self):
+        """No more jobs will be submitted: workers exit once the queues drain."""
+        self.queue.close()
+        self.audio_queue.close()
+
+    def stop(self):
+        self.running = False
+        for q in (self.queue, self.audio_queue):
+            q.clear()
+            q.close()
+
+        with self._lock:
+            procs = list(self.active_processes)
+        for p in procs:
+            try:
+                os.kill(p.pid, signal.SIGINT)
+            except:
+                pass
+
+    # Queue edits apply to whichever queue holds the job
+
+    def set_policy(self, policy):
+        self.queue.set_policy(policy)
+        self.audio_queue.set_policy(policy)
+
+    def set_priority(self, job_id, priority):
+        self.queue.set_priority(job_id, priority)
+        self.audio_queue.set_priority(job_id, priority)
+
+    def set_pinned(self, job_id, pinned):
+        self.queue.set_pinned(job_id, pinned)
+        self.audio_queue.set_pinned(job_id, pinned)
+
+    def running_processes(self):
+        with self._lock:
+            return [p for p in self.active_processes if p.poll() is None]
+
+    # ---------- WORKERS ----------
+
+    def _worker(self, queue):
+        try:
+            while self.running:
+                job = queue.pop(timeout=0.5)
+                if job is None:
+                    if queue.closed:
+                        break
+                    continue
+
+                if self.on_job_start:
+                    self.on_job_start(job)
+                self._emit("job_start", job)
+                try:
+                    self._run_job(job)
+                except Exception as e:
+                    # A bad preset or plugin fails its job, never the worker
+                    job.status, job.error = "failed", "exception"
+                    self._finish_processes()
+                    self._log(f"❌ {os.path.basename(job.path)}: {type(e).__name__}: {e}")
+                if job.status.startswith("done") and job.duplicates:
+                    self._fan_out(job)
+                with self._lock:
+                    self.finished.append((job.path, job.status, job.returncode))
+                    self.counts[job.status] = self.counts.get(job.status, 0) + 1
+                if self.on_job_done:
+                    self.on_job_done(job)
+                self._emit("job_done", job)
+        finally:
+            with self._lock:
+                self._threads.remove(threading.current_thread())
+                last = not self._threads
+        if last:
+            self._emit("finished")
+            if self.on_finished:
+                self.on_finished()
+
+    def _prober(self):
+        while self.running:
+            try:
+                job = self._unprobed.get(timeout=0.5)
+            except queue.Empty:
+                if self.queue.closed and self.audio_queue.closed:
+                    break
+                continue
+            if job.duration or job.status != "queued":
+                continue        # a worker got to it first
+            probe = self._plugin(job, "probe", "probe") or probe_media
+            try:
+                duration = probe(job.path).get("duration") or 0.0
+            except Exception:
+                continue
+            for q in (self.queue, self.audio_queue):
+                q.set_duration(job.id, duration)
+
+    def _emit(self, kind, job=None, **data):
+        if self.bus:
+            self.bus.publish(kind, job, source=self.source, **data)
+
+    def _log(self, msg):
+        if self.on_log:
+            self.on_log(msg)
+        self._emit("log", msg=msg)
+
+    def _progress(self, job, sec):
+        if self.on_progress:
+            self.on_progress(job, sec)
+        self._emit("progress", job, sec=sec, speed=job.speed)
+
+    def _run_job(self, job):
+        name = os.path.basename(job.path)
+        args = job.args
+        progress = None
+        if self.on_progress or self.bus:
+            progress = lambda sec: self._progress(job, sec)
+        probe = self._plugin(job, "probe", "probe") or probe_media
+        if not job.duration:
+            job.duration = probe(job.path).get("duration") or 0.0
+        video = probe(job.path).get("video") or {}
+        pixels = (video.get("width") or 0) * (video.get("height") or 0)
+
+        if job.target_mb or job.target_kbps:
+            job.status = "running"
+            target = f"{job.target_kbps} kbps" if job.target_kbps else f"{job.target_mb} MB"
+            self._log(f"🎯 {name}: two-pass to {target}")
+
+            def two_pass(on_progress, on_start, on_log):
+                return run_two_pass(job, on_progress=on_progress, on_start=on_start,
+                                    log=lambda m: self._log(f"{name}: {m}"))
+
+            budget = time_budget(job.duration, job.args, passes=2, pixels=pixels)
+            job.returncode, job.error = self._supervised(job, progress, two_pass, budget)
+            if job.error and self.running:
+                self._log(f"❌ {name}: {job.error} (exit {job.returncode})")
+            self._finish(job)
+            return
+
+        if self.smart_copy:
+            action, args, reason = route_job(probe(job.path), args, job.path, job.outfile)
+            if action == "skip":
+                job.status = "skipped"
+                self._log(f"⏭ {name}: {reason}")
+                return
+            if action == "copy":
+                self._log(f"⚡ {name}: {reason}")
+        routed = args
+
+        if is_audio_job(args):
+            args = prepare_audio_args(job.path, args, log=lambda m: self._log(f"{name}: {m}"))
+
+        if job.auto_crf and quality_opt(args):
+            crf = select_crf(job.path, args, on_log=lambda m: self._log(f"{name}: {m}"))
+            if crf is not None:
+                args = set_opt(args, quality_opt(args), str(crf))
+                self._log(f"🔬 {name}: auto CRF {crf}")
+
+        job.status = "running"
+        started = time.monotonic()
+        executor = self._plugin(job, "executor", "run_job")
+        if executor:
+            # Plugins get the same watchdog as FFmpeg: stalls and overruns kill
+            # the processes they report through on_start
+            def execute(on_progress, on_start, on_log):
+                try:
+                    return executor(job, args, on_progress, on_start)
+                except Exception as e:
+                    on_log(f"executor plugin: {type(e).__name__}: {e}")
+                    self._log(f"❌ {name}: executor plugin raised {type(e).__name__}: {e}")
+                    return 1    # a plain failure, not a crash worth retrying
+
+            budget = time_budget(job.duration, args, pixels=pixels)
+            rc, kind = self._supervised(job, progress, execute, budget)
+            if kind and self.running:
+                self._log(f"❌ {name}: {kind} (exit {rc})")
+            job.returncode, job.error = rc, kind
+        else:
+            def encode(on_progress, on_start, on_log):
+                return run_ffmpeg(job.path, job.outfile, args, on_progress=on_progress,
+                                  on_start=on_start, on_log=on_log,
+                                  on_speed=lambda x: setattr(job, "speed", x)).wait()
+
+            attempt = 0
+            while True:
+                budget = time_budget(job.duration, args, pixels=pixels)
+                rc, kind = self._supervised(job, progress, encode, budget)
+                if not kind or not self.running:
+                    break
+                # The fallback preset copies video; it is no substitute for an audio export
+                retry = None
+                if should_retry(kind, attempt) and not is_audio_job(args):
+                    retry = fallback_args(args)
+                if not retry:
+                    self._log(f"❌ {name}: {kind} (exit {rc})")
+                    break
+                attempt += 1
+                self._log(f"🔁 {name}: {kind}, retrying with '{FALLBACK_PRESET}'")
+                job.fallback = kind
+                args = retry
+                started = time.monotonic()
+            job.returncode, job.error = rc, kind
+        self._finish(job)
+        if job.status == "done" and job.fallback:
+            job.status = "done (fallback)"
+            self._log(f"⚠ {name}: output is a '{FALLBACK_PRESET}' copy after {job.fallback}, not the requested preset")
+
+        if job.status == "done":
+            # Feeds dry-run predictions; keyed like plan_batch looks them up,
+            # by the routed args before per-file audio / CRF values
+            try:
+                record_job_stats(routed, job.duration, time.monotonic() - started,
+                                 os.path.getsize(job.path), os.path.getsize(job.outfile))
+            except OSError:
+                pass
+
+        post_step = self._plugin(job, "post_step", "run")
+        if post_step and job.status == "done":
+            # The output is already written; a failing post-step doesn't undo it
+            try:
+                post_step(job, lambda m: self._log(f"{name}: {m}"))
+            except Exception as e:
+                self._log(f"⚠ {name}: post-step plugin failed: {type(e).__name__}: {e}")
+
+    def _supervised(self, job, progress, run, budget=None):
+        """run(on_progress, on_start, on_log) -> returncode, under the watchdog.
+        Returns (returncode, failure kind or None)."""
+        watch = watchdog.watch(budget)
+        tail = deque(maxlen=40)
+
+        def on_progress(sec):
+            watch.progress(sec)
+            if progress:
+                progress(sec)
+
+        def on_start(proc):
+            self._track(proc)
+            watch.attach(proc)
+
+        try:
+            rc = run(on_progress, on_start, tail.append)
+        except (OSError, ValueError) as e:
+            tail.append(str(e))
+            rc = -1
+        finally:
+            watchdog.release(watch)
+        return rc, classify(rc, tail, watch.reason)
+
+    def _fan_out(self, job):
+        """Give every duplicate input its own output name, sharing one encode."""
+        for path, outfile in job.duplicates:
+            try:
+                link_or_copy(job.outfile, outfile)
+                self._log(f"🔗 {os.path.basename(path)}: same content, linked output")
+            except OSError as e:
+                self._log(f"❌ {os.path.basename(path)}: could not link output ({e})")
+
+    def _plugin(self, job, kind, func):
+        """Function from the plugin a job selected for this kind (imported on first use)."""
+        name = job.plugins.get(kind)
+        if not name:
+            return None
+        try:
+            return getattr(load_plugin(name, kind), func)
+        except Exception as e:
+            self._log(f"⚠ Plugin '{name}' unavailable: {e}")
+            return None
+
+    def _finish_processes(self):
+        with self._lock:
+            self.active_processes[:] = [p for p in self.active_processes if p.poll() is None]
+
+    def _finish(self, job):
+        self._finish_processes()
+
+        if not self.running:
+            job.status = "stopped"
+        else:
+            job.status = "done" if job.returncode == 0 else "failed"
+
+    def _track(self, proc):
+        with self._lock:
+            self.active_processes.append(proc)
+
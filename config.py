@@ -6,4 +6,69 @@ FFPROBE_PATH = FFMPEG_PATH.replace("ffmpeg.exe", "ffprobe.exe")
 
 PRESET_FILE = "ffmpeg_presets.json"
 
-VIDEO_EXTS = (".ts", ".mp4", ".mkv", ".avi", ".mov")
\ No newline at end of file
+VIDEO_EXTS = (".ts", ".mp4", ".mkv", ".avi", ".mov")
+
+# Batch queue ordering: label shown in the GUI -> policy key
+ORDER_POLICIES = {
+    "Folder order": "fifo",
+    "Shortest first": "sjf",
+    "Longest first": "ljf",
+}
+
+# Thumbnail / preview frame cache
+PREVIEW_CACHE_DIR = "preview_cache"
+PREVIEW_CACHE_MB = 200
+THUMBS_KEPT = 300           # row thumbnails held in memory; least recently shown are dropped
+
+# Encoding farm (coordinator / worker mode)
+FARM_HOST = "127.0.0.1"     # interface the coordinator binds; set a LAN address to serve workers
+FARM_PORT = 8765
+FARM_TOKEN = ""             # shared secret, required when FARM_HOST is not loopback
+FARM_HEARTBEAT_SECS = 5
+FARM_WORKER_TIMEOUT = 30
+FARM_LEASE_GRACE = 15       # a lease the owner stops reporting is requeued after this
+
+# Two-pass first-pass stats, one subfolder per (file, encode settings)
+TWOPASS_CACHE_DIR = "twopass_cache"
+TWOPASS_CACHE_MB = 100      # least recently used stats folders beyond this are removed
+
+# Auto CRF: sample clips are encoded at each candidate and scored against
+# the source; the smallest encode meeting the floor wins
+QUALITY_CACHE_FILE = "quality_cache.json"
+QUALITY_FLOOR_SSIM = 0.97
+QUALITY_FLOOR_VMAF = 93.0
+CRF_CANDIDATES = (18, 21, 24, 27, 30, 33)
+
+# Plugins: *.py files (or packages) in PLUGIN_DIR plus installed entry points
+PLUGIN_DIR = "plugins"
+PLUGIN_MANIFEST = "plugin_manifest.json"
+
+# Audio-only jobs run in their own, wider pool (0 = one per CPU core)
+AUDIO_WORKERS = 0
+LOUDNORM_CACHE_FILE = "loudnorm_cache.json"
+
+# Per-preset encode speed / size history used by dry-run cost reports
+SPEED_HISTORY_FILE = "speed_history.json"
+SPEED_HISTORY_MAX = 200     # preset entries kept, least recently updated dropped first
+
+# Memory budget for long sessions / very large batches
+MAX_LOG_LINES = 5000        # console lines kept
+MAX_JOB_RECORDS = 1000      # finished-job records kept by the engine
+META_CACHE_MAX = 20000      # per-file probe / estimate cache entries
+INGEST_MEMORY_MAX = 50000   # paths / fingerprints the watch-folder ingest remembers
+
+# Event bus: per-subscriber queue bound and the GUI drain interval
+EVENT_QUEUE_MAX = 10000
+EVENT_TICK_MS = 100
+
+# HLS / DASH packaging
+PACKAGE_SEGMENT_SECS = 6
+PACKAGE_WORKERS = 0         # 0 = one per rendition, up to the CPU count
+
+# Job supervision: stall / timeout kill and fallback retry
+STALL_SECS = 60             # no progress-time change for this long = stalled
+TIMEOUT_FACTOR = 10         # wall-clock budget = duration x factor x preset cost x passes ...
+TIMEOUT_MIN_SECS = 600      # ... but never less than this
+HELPER_TIMEOUT_SECS = 120   # ffprobe calls and analysis sample clips
+FALLBACK_PRESET = "Direct Copy + Error Correction"
+MAX_RETRIES = 1
@@ -0,0 +1,80 @@
+# dedup.py
+# Content-hash deduplication of inputs before encoding
+# size -> partial hash (head/middle/tail) -> full hash, each stage only for collisions
+
+import hashlib
+import mmap
+import os
+import shutil
+
+from file_manager import get_metadata
+
+PARTIAL_CHUNK = 1024 * 1024
+READ_BUFFER = 8 * 1024 * 1024
+
+
+def partial_hash(path):
+    """Hash of size + 1 MiB from the head, middle and tail (cached with the metadata)."""
+    meta = get_metadata(path)
+    if "partial_hash" in meta:
+        return meta["partial_hash"]
+
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            for start in (0, max(0, size // 2 - PARTIAL_CHUNK // 2), max(0, size - PARTIAL_CHUNK)):
+                h.update(m[start:start + PARTIAL_CHUNK])
+
+    meta["partial_hash"] = h.hexdigest()
+    return meta["partial_hash"]
+
+
+def full_hash(path):
+    meta = get_metadata(path)
+    if "full_hash" in meta:
+        return meta["full_hash"]
+
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            block = f.read(READ_BUFFER)
+            if not block:
+                break
+            h.update(block)
+
+    meta["full_hash"] = h.hexdigest()
+    return meta["full_hash"]
+
+
+def _group(paths, key):
+    groups = {}
+    for p in paths:
+        try:
+            groups.setdefault(key(p), []).append(p)
+        except OSError:
+            pass
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def find_duplicates(paths):
+    """Groups of identical files (each a list, original order kept). Unique files are omitted."""
+    order = {p: i for i, p in enumerate(paths)}
+    result = []
+    for same_size in _group(paths, os.path.getsize):
+        for same_partial in _group(same_size, partial_hash):
+            for same in _group(same_partial, full_hash):
+                result.append(sorted(same, key=order.get))
+    return result
+
+
+def link_or_copy(src, dst):
+    """Give dst the same content as src: hard link when possible, else copy."""
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
@@ -0,0 +1,267 @@
+# dry_run.py
+# Dry-run planning: resolve a batch into final FFmpeg commands without running them,
+# report collisions and predicted cost, and save/replay the plan as a job file.
+#
+#   python dry_run.py plan --folder D:\media --preset "H.264 CPU Standard" [--target-mb 700] [--auto-crf] --save plan.json
+#   python dry_run.py run plan.json --workers 2 [--json] [--log run.log] [--metrics m.json]
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from audio_pipeline import output_ext, is_audio_job, select_audio_streams, needs_loudness
+from estimations import load_history, predict_job
+from ffmpeg_args import get_opt, parse_kbps
+from ffmpeg_runner import build_command
+from file_manager import build_output_name, probe_media
+from quality_analysis import quality_opt
+from routing import route_job
+from twopass import supports_two_pass, pass_commands
+
+PLAN_VERSION = 2
+# Version 1 files predate target size / auto CRF / plugins / priority and load with defaults
+READABLE_VERSIONS = (1, 2)
+
+
+def plan_batch(paths, args, out_dir=None, preset=None, smart_copy=True,
+               target_mb=None, auto_crf=False, plugins=None, order=None, target_kbps=None):
+    """Resolve every input into its job and final argv. Runs ffprobe, never FFmpeg.
+
+    order maps path -> (priority, pinned). Two-pass jobs list both pass
+    commands in "passes". Parts of a command only known at run time (measured
+    loudnorm values, auto CRF) are named in "runtime"; the argv shows the
+    preset's value there.
+    """
+    history = load_history()
+    order = order or {}
+    if not supports_two_pass(args):
+        target_mb = target_kbps = None
+    jobs = []
+    by_output = {}
+
+    for path in paths:
+        outfile = build_output_name(path, out_dir, ext=output_ext(args), make_dirs=False)
+        info = probe_media(path)
+        duration = info.get("duration") or 0.0
+        try:
+            in_bytes = os.path.getsize(path)
+        except OSError:
+            in_bytes = 0
+
+        job_args, action = args, "encode"
+        if target_mb or target_kbps:
+            # The engine never re-routes a target-size / bitrate job
+            action = "two-pass"
+        elif smart_copy:
+            action, job_args, _ = route_job(info, args, path, outfile)
+
+        if action == "skip":
+            secs, out_bytes, source = 0.0, 0, "skip"
+        else:
+            secs, out_bytes, source = predict_job(job_args, duration, in_bytes, history)
+        if action == "two-pass":
+            secs = secs * 2
+            if target_kbps:
+                audio_kbps = parse_kbps(get_opt(job_args, "-b:a")) or 128
+                out_bytes = int((target_kbps + audio_kbps) * 1000 / 8 * duration)
+            else:
+                out_bytes = int(target_mb * 1024 * 1024)
+
+        # The command as the engine will build it
+        run_args, runtime, passes = job_args, [], None
+        if action == "two-pass":
+            passes = pass_commands(path, outfile, job_args, target_mb, duration, target_kbps)
+            if not passes:
+                runtime.append("no duration: two-pass bitrate unknown, job will fail")
+        elif action != "skip":
+            if is_audio_job(job_args):
+                run_args = select_audio_streams(job_args)
+                if needs_loudness(job_args):
+                    runtime.append("loudnorm measured per file")
+            if auto_crf and quality_opt(job_args):
+                runtime.append(f"{quality_opt(job_args)} picked per file")
+
+        priority, pinned = order.get(path, (0, False))
+        jobs.append({
+            "path": path, "outfile": outfile, "args": job_args, "action": action,
+            "argv": (passes[-1] if passes else None) if action == "two-pass"
+                    else build_command(path, outfile, run_args),
+            "passes": passes, "runtime": runtime,
+            "duration": duration, "in_bytes": in_bytes,
+            "pred_secs": round(secs, 1), "pred_bytes": out_bytes, "basis": source,
+            "priority": priority, "pinned": pinned,
+        })
+        if action != "skip":
+            by_output.setdefault(os.path.normcase(os.path.abspath(outfile)), []).append(path)
+
+    inputs = {os.path.normcase(os.path.abspath(p)) for p in paths}
+    collisions = []
+    for out, srcs in by_output.items():
+        if len(srcs) > 1:
+            collisions.append({"outfile": out, "inputs": srcs, "kind": "shared output"})
+        elif out in inputs:
+            collisions.append({"outfile": out, "inputs": srcs, "kind": "overwrites an input"})
+        elif os.path.exists(out):
+            collisions.append({"outfile": out, "inputs": srcs, "kind": "already exists"})
+
+    return {
+        "version": PLAN_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "preset": preset,
+        "args": args,
+        "target_mb": target_mb,
+        "target_kbps": target_kbps,
+        "auto_crf": auto_crf,
+        "plugins": plugins or {},
+        "jobs": jobs,
+        "collisions": collisions,
+    }
+
+
+def format_report(plan, workers=1):
+    jobs = plan["jobs"]
+    active = [j for j in jobs if j["action"] != "skip"]
+    total_dur = sum(j["duration"] for j in jobs)
+    total_secs = sum(j["pred_secs"] for j in active)
+    out_bytes = sum(j["pred_bytes"] for j in active)
+
+    basis = {}
+    for j in active:
+        basis[j["basis"]] = basis.get(j["basis"], 0) + 1
+
+    lines = [
+        f"🧾 Dry run: {len(jobs)} files, preset {plan.get('preset') or plan['args']}",
+        f"   input duration : {_hms(total_dur)}",
+        f"   encode time    : {_hms(total_secs)} serial, ~{_hms(total_secs / max(workers, 1))} on {workers} worker(s)",
+        f"   output size    : {out_bytes / 1024 ** 3:.2f} GB",
+        f"   jobs           : {len(active)} to run, {len(jobs) - len(active)} skipped (already match)",
+        "   predicted from : " + ", ".join(f"{k} {v}" for k, v in sorted(basis.items())),
+    ]
+    runtime = {}
+    for j in active:
+        for what in j.get("runtime", []):
+            runtime[what] = runtime.get(what, 0) + 1
+    for what, n in sorted(runtime.items()):
+        lines.append(f"   at run time    : {what} ({n} jobs)")
+    if plan.get("target_kbps"):
+        lines.append(f"   target bitrate : {plan['target_kbps']} kbps video (two-pass)")
+    elif plan.get("target_mb"):
+        lines.append(f"   target size    : {plan['target_mb']} MB per file (two-pass)")
+    if plan.get("auto_crf"):
+        lines.append("   auto CRF       : picked per file at run time")
+    if plan.get("plugins"):
+        lines.append("   plugins        : " + ", ".join(f"{k}={v}" for k, v in sorted(plan["plugins"].items())))
+    for c in plan["collisions"]:
+        names = ", ".join(os.path.basename(p) for p in c["inputs"])
+        lines.append(f"⚠ {os.path.basename(c['outfile'])}: {c['kind']} ({names})")
+    return lines
+
+
+def _hms(secs):
+    secs = int(secs)
+    return f"{secs // 3600}:{secs // 60 % 60:02d}:{secs % 60:02d}"
+
+
+def save_plan(plan, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+
+
+def load_plan(path):
+    with open(path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") not in READABLE_VERSIONS:
+        raise ValueError(f"unsupported job file version: {plan.get('version')}")
+    return plan
+
+
+def plan_engine(plan, workers=1, **callbacks):
+    """BatchEngine loaded with a plan's jobs. Args are already resolved, so no re-routing."""
+    from batch_engine import BatchEngine
+    from job_queue import Job
+
+    engine = BatchEngine(workers=workers, smart_copy=False, **callbacks)
+    for j in plan["jobs"]:
+        if j["action"] == "skip":
+            continue
+        job = Job(j["path"], j["outfile"], j["args"], preset=plan.get("preset"),
+                  priority=j.get("priority", 0), pinned=j.get("pinned", False))
+        job.duration = j["duration"]
+        job.target_mb = plan.get("target_mb")
+        job.target_kbps = plan.get("target_kbps")
+        job.auto_crf = plan.get("auto_crf", False)
+        job.plugins = dict(plan.get("plugins") or {})
+        engine.submit(job)
+    return engine
+
+
+# ---------------- CLI (headless) ----------------
+
+def main():
+    ap = argparse.ArgumentParser(description="Plan or replay an FFmpeg batch")
+    sub = ap.add_subparsers(dest="mode", required=True)
+
+    p = sub.add_parser("plan")
+    p.add_argument("--folder", required=True)
+    p.add_argument("--preset", required=True)
+    p.add_argument("--out")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--target-mb", type=float, help="two-pass encode to this output size")
+    p.add_argument("--target-kbps", type=int, help="two-pass encode at this video bitrate")
+    p.add_argument("--auto-crf", action="store_true", help="pick CRF per file at run time")
+    p.add_argument("--save")
+
+    r = sub.add_parser("run")
+    r.add_argument("plan")
+    r.add_argument("--workers", type=int, default=1)
+    r.add_argument("--json", action="store_true", help="print events as JSON lines")
+    r.add_argument("--log", help="append events to this file")
+    r.add_argument("--metrics", help="keep a JSON metrics snapshot in this file")
+
+    opts = ap.parse_args()
+
+    if opts.mode == "plan":
+        from file_manager import scan_folder
+        from presets import get_presets
+
+        preset = get_presets()[opts.preset]
+        plugins = {k: preset[k] for k in ("probe", "executor", "post_step") if k in preset}
+        plan = plan_batch(scan_folder(opts.folder), preset["args"], opts.out, preset=opts.preset,
+                          target_mb=opts.target_mb, target_kbps=opts.target_kbps,
+                          auto_crf=opts.auto_crf, plugins=plugins)
+        print("\n".join(format_report(plan, opts.workers)))
+        if opts.save:
+            save_plan(plan, opts.save)
+            print(f"saved {opts.save}")
+        return
+
+    from event_bus import EventBus, json_printer, file_logger, MetricsWriter
+
+    plan = load_plan(opts.plan)
+    bus = EventBus()
+    subs = []
+    if opts.json:
+        subs.append(bus.attach(json_printer()))
+    if opts.log:
+        subs.append(bus.attach(file_logger(opts.log)))
+    if opts.metrics:
+        subs.append(bus.attach(MetricsWriter(opts.metrics), interval=2.0))
+
+    done = threading.Event()
+    callbacks = {} if opts.json else {
+        "on_log": print,
+        "on_job_done": lambda job: print(f"{job.status}: {job.path}")}
+    engine = plan_engine(plan, opts.workers, bus=bus, on_finished=done.set, **callbacks)
+    engine.start()
+    engine.finish()
+    done.wait()
+
+    for sub in subs:
+        sub.close()
+        sub.thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 # estimations.py
 # Estimate output file size based on duration and FFmpeg args --- Size estimation logic
 
+import json
+import os
+import queue
 import re
+import threading
+from collections import OrderedDict
+
+from config import SPEED_HISTORY_FILE, SPEED_HISTORY_MAX, META_CACHE_MAX
+from ffmpeg_args import video_codec, get_opt
+from file_manager import get_metadata, file_fingerprint, probe_media
+
 
 def estimate_size_mb(duration_sec, args):
     v = re.search(r"-b:v\s+(\d+)k", args)
@@ -16,3 +26,146 @@ def estimate_size_mb(duration_sec, args):
     total_kbps = v_kbps + a_kbps
     mb = (total_kbps * duration_sec) / 8 / 1024
     return round(mb, 2)
+
+
+# Relative encode cost per second of input, by video encoder (libx264 medium = 1.0)
+ENCODER_COST = {
+    "copy": 0.02, "none": 0.05,
+    "h264_qsv": 0.25, "hevc_qsv": 0.3,
+    "libx264": 1.0, "libx265": 3.0,
+}
+
+X26X_PRESET_COST = {
+    "ultrafast": 0.25, "superfast": 0.35, "veryfast": 0.5, "faster": 0.7,
+    "fast": 0.85, "medium": 1.0, "slow": 1.6, "slower": 2.8, "veryslow": 5.0,
+}
+
+
+def preset_cost(args):
+    enc = video_codec(args) or "libx264"
+    cost = ENCODER_COST.get(enc, 1.0)
+    if enc.startswith("libx26"):
+        cost *= X26X_PRESET_COST.get(get_opt(args, "-preset", "medium"), 1.0)
+    return cost
+
+
+# ---------------- HISTORY (per preset args) ----------------
+# Moving averages of encode speed (x realtime) and output/input size ratio.
+# Keyed by the routed preset args, before per-file audio / CRF rewriting, so
+# one preset keeps one entry; the least recently updated entries beyond
+# SPEED_HISTORY_MAX are dropped. The file is read once per process.
+
+HISTORY_WEIGHT = 0.2
+
+# Without history: assume libx264 medium runs ~2x realtime, scaled by preset cost
+BASE_SPEED = 2.0
+
+_history_lock = threading.Lock()
+_history = None
+
+
+def _read_history():
+    try:
+        with open(SPEED_HISTORY_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return OrderedDict()
+    return OrderedDict(list(data.items())[-SPEED_HISTORY_MAX:])
+
+
+def load_history():
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = _read_history()
+        return dict(_history)
+
+
+def record_job_stats(args, duration, elapsed, in_bytes, out_bytes):
+    global _history
+    if duration <= 0 or elapsed <= 0 or in_bytes <= 0:
+        return
+    speed, ratio = duration / elapsed, out_bytes / in_bytes
+    with _history_lock:
+        if _history is None:
+            _history = _read_history()
+        h = _history.pop(args, None)
+        if h:
+            h = dict(h)
+            h["speed"] += HISTORY_WEIGHT * (speed - h["speed"])
+            h["ratio"] += HISTORY_WEIGHT * (ratio - h["ratio"])
+            h["n"] += 1
+        else:
+            h = {"speed": speed, "ratio": ratio, "n": 1}
+        _history[args] = h
+        while len(_history) > SPEED_HISTORY_MAX:
+            _history.popitem(last=False)
+        tmp = SPEED_HISTORY_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_history, f, indent=2)
+        os.replace(tmp, SPEED_HISTORY_FILE)
+
+
+def predict_job(args, duration, in_bytes, history=None):
+    """(seconds, bytes, source) for one job; source says what the prediction is based on."""
+    h = (history if history is not None else load_history()).get(args)
+    if h:
+        return duration / max(h["speed"], 0.01), int(in_bytes * h["ratio"]), "history"
+
+    secs = duration / (BASE_SPEED / max(preset_cost(args), 0.01))
+    est = estimate_size_mb(duration, args)
+    if est:
+        return secs, int(est * 1024 * 1024), "bitrate"
+    if video_codec(args) == "copy":
+        return secs, in_bytes, "copy"
+    return secs, in_bytes, "guess"
+
+
+# ---------------- BACKGROUND ESTIMATION ----------------
+
+class EstimationService:
+    """Estimates sizes off the Tk thread, memoized per (file fingerprint, args).
+
+    Each request() supersedes the previous one: queued work for an older
+    request is dropped, so switching presets quickly never piles up probes.
+    on_result(path, est) is called from the worker thread.
+    """
+
+    def __init__(self, on_result):
+        self.on_result = on_result
+        self.memo = OrderedDict()
+        self.generation = 0
+        self.tasks = queue.Queue()
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def request(self, paths, args):
+        self.generation += 1
+        gen = self.generation
+        for path in paths:
+            # Only use a fingerprint that is already known: no file reads here
+            fp = get_metadata(path).get("fingerprint")
+            if fp and (fp, args) in self.memo:
+                self.on_result(path, self.memo[(fp, args)])
+            else:
+                self.tasks.put((gen, path, args))
+
+    def cancel(self):
+        self.generation += 1
+
+    def _worker(self):
+        while True:
+            gen, path, args = self.tasks.get()
+            if gen != self.generation:
+                continue
+            try:
+                fp = file_fingerprint(path)
+                duration = probe_media(path).get("duration") or 0
+                est = estimate_size_mb(duration, args)
+            except Exception:
+                continue
+            if fp:
+                self.memo[(fp, args)] = est
+                if len(self.memo) > META_CACHE_MAX:
+                    self.memo.popitem(last=False)
+            if gen == self.generation:
+                self.on_result(path, est)
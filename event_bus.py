@@ -0,0 +1,175 @@
+# event_bus.py
+# In-process event bus for job lifecycle, progress and log events
+#
+# Publishers (engine workers, farm, GUI) never block and never touch Tk.
+# Each subscriber has its own bounded queue:
+#   - progress events are coalesced per job, only the latest is kept
+#   - log events are dropped (and counted) once the queue is full
+#   - lifecycle events (job_start / job_done / finished) are always kept, as
+#     are other one-off results (the GUI's thumbnail / preview / plan events)
+# The GUI drains its subscription on a fixed tick; other consumers attach
+# with a handler that runs on its own thread.
+
+import json
+import os
+import sys
+import threading
+import time
+
+from config import EVENT_QUEUE_MAX
+
+
+class Event:
+    __slots__ = ("kind", "job", "data", "time")
+
+    def __init__(self, kind, job, data):
+        self.kind = kind
+        self.job = job
+        self.data = data
+        self.time = time.time()
+
+    def to_dict(self):
+        d = {"time": round(self.time, 3), "event": self.kind}
+        if self.job is not None:
+            d["job"] = self.job.path
+            d["status"] = self.job.status
+        d.update(self.data)
+        return d
+
+
+class Subscription:
+    def __init__(self, bus, maxsize=EVENT_QUEUE_MAX):
+        self.bus = bus
+        self.maxsize = maxsize
+        self.queue = []
+        self.progress = {}          # job id -> latest progress event
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self._stop = None
+
+    def put(self, ev):
+        with self.lock:
+            if ev.kind == "progress":
+                self.progress[ev.job.id] = ev
+                return
+            if ev.kind == "job_done":
+                # A late progress value must not land after the final state
+                self.progress.pop(ev.job.id, None)
+            elif ev.kind == "log" and len(self.queue) >= self.maxsize:
+                self.dropped += 1
+                return
+            self.queue.append(ev)
+
+    def drain(self):
+        """Everything pending: queued events in order, then the latest progress per job."""
+        with self.lock:
+            events, self.queue = self.queue, []
+            progress, self.progress = self.progress, {}
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            events.append(Event("log", None, {"msg": f"… {dropped} log lines dropped"}))
+        events.extend(progress.values())
+        return events
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        if self._stop:
+            self._stop.set()
+
+
+class EventBus:
+    def __init__(self):
+        self.subs = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, maxsize=EVENT_QUEUE_MAX):
+        sub = Subscription(self, maxsize)
+        with self.lock:
+            self.subs = self.subs + [sub]
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subs = [s for s in self.subs if s is not sub]
+
+    def publish(self, kind, job=None, **data):
+        ev = Event(kind, job, data)
+        for sub in self.subs:       # copy-on-write list, no lock needed
+            sub.put(ev)
+
+    def attach(self, handler, interval=0.5, maxsize=EVENT_QUEUE_MAX):
+        """Call handler(events) from a background thread every interval.
+        close() on the returned subscription stops it after a final drain."""
+        sub = self.subscribe(maxsize)
+        sub._stop = threading.Event()
+
+        def loop():
+            while not sub._stop.wait(interval):
+                events = sub.drain()
+                if events:
+                    handler(events)
+            handler(sub.drain())
+
+        sub.thread = threading.Thread(target=loop, daemon=True)
+        sub.thread.start()
+        return sub
+
+
+# ---------------- SUBSCRIBERS ----------------
+
+def json_printer(stream=None):
+    """Handler printing one JSON object per event (for headless runs)."""
+    def handle(events):
+        out = stream or sys.stdout
+        for ev in events:
+            out.write(json.dumps(ev.to_dict()) + "\n")
+        out.flush()
+    return handle
+
+
+def file_logger(path):
+    """Handler appending log and lifecycle events to a text file."""
+    def handle(events):
+        lines = []
+        for ev in events:
+            if ev.kind == "progress":
+                continue
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ev.time))
+            if ev.kind == "log":
+                lines.append(f"{stamp} {ev.data['msg']}")
+            elif ev.job is not None:
+                lines.append(f"{stamp} {ev.kind} {ev.job.path} {ev.job.status}")
+            else:
+                lines.append(f"{stamp} {ev.kind}")
+        if lines:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+    return handle
+
+
+class MetricsWriter:
+    """Handler keeping batch counters and rewriting a JSON snapshot on each drain."""
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}
+        self.active = {}            # job path -> {"sec", "speed"}
+        self.events = 0
+
+    def __call__(self, events):
+        self.events += len(events)
+        for ev in events:
+            if ev.kind == "job_start":
+                self.active[ev.job.path] = {"sec": 0.0, "speed": None}
+            elif ev.kind == "progress" and ev.job.path in self.active:
+                self.active[ev.job.path] = {"sec": ev.data.get("sec"), "speed": ev.data.get("speed")}
+            elif ev.kind == "job_done":
+                self.active.pop(ev.job.path, None)
+                self.counts[ev.job.status] = self.counts.get(ev.job.status, 0) + 1
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"time": time.time(), "events": self.events,
+                       "counts": self.counts, "active": self.active}, f, indent=2)
+        os.replace(tmp, self.path)
@@ -0,0 +1,407 @@
+# farm.py
+# Distributed encode farm: a coordinator owns the job queue, workers on other hosts
+# pull jobs over HTTP/JSON, run them with run_ffmpeg and report back.
+#
+#   python farm.py coordinator --folder D:\media --preset "H.264 CPU Standard" --host 0.0.0.0 --token s3cret
+#   python farm.py worker --url http://coordinator:8765 --token s3cret --map "D:/media=/mnt/media"
+#
+# Workers run the FFmpeg given with --ffmpeg ("ffmpeg" on PATH by default), not
+# config.FFMPEG_PATH, which points at the coordinator host's own install.
+#
+# Every request carries the shared token; a coordinator bound to anything but
+# loopback refuses to start without one.
+
+import argparse
+import collections
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (FARM_HOST, FARM_PORT, FARM_TOKEN, FARM_HEARTBEAT_SECS,
+                    FARM_WORKER_TIMEOUT, FARM_LEASE_GRACE)
+from ffmpeg_runner import run_ffmpeg
+from job_queue import Job, JobQueue
+from supervisor import watchdog
+
+
+# ---------------- COORDINATOR ----------------
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Coordinator:
+    def __init__(self, host=FARM_HOST, port=FARM_PORT, policy="fifo", token=FARM_TOKEN,
+                 worker_timeout=FARM_WORKER_TIMEOUT,
+                 on_log=None, on_job_done=None, on_finished=None):
+        if not token and not _is_loopback(host):
+            raise ValueError(f"a shared farm token is required to listen on {host}")
+        self.token = token
+        self.queue = JobQueue(policy)
+        self.worker_timeout = worker_timeout
+        self.on_log = on_log
+        self.on_job_done = on_job_done
+        self.on_finished = on_finished
+
+        self.leases = {}        # job_id -> (job, worker)
+        self.lease_seen = {}    # job_id -> last time the owner reported it (monotonic)
+        self.workers = {}       # worker -> last heartbeat (monotonic)
+        self.progress = {}      # job_id -> seconds encoded
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.running = False
+
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if coordinator.token and not hmac.compare_digest(
+                        self.headers.get("X-Farm-Token", ""), coordinator.token):
+                    self.send_response(403)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    reply = coordinator.handle(self.path, body)
+                    code = 200 if reply is not None else 404
+                except Exception as e:
+                    reply, code = {"error": str(e)}, 400
+                data = json.dumps(reply).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    def _log(self, msg):
+        if self.on_log:
+            self.on_log(msg)
+
+    def submit(self, job):
+        with self.lock:
+            self.pending += 1
+        self.queue.push(job)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reaper, daemon=True).start()
+        host, port = self.server.server_address[:2]
+        self._log(f"🛰 Farm coordinator listening on {host}:{port}")
+
+    def stop(self):
+        self.running = False
+        self.queue.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ---------- PROTOCOL ----------
+
+    def handle(self, path, body):
+        worker = body.get("worker", "?")
+        with self.lock:
+            if worker not in self.workers:
+                self._log(f"🖥 Worker joined: {worker}")
+            self.workers[worker] = time.monotonic()
+
+        if path == "/lease":
+            return self._lease(worker)
+        if path == "/heartbeat":
+            return self._heartbeat(worker, body.get("progress", {}))
+        if path == "/result":
+            return self._result(worker, body)
+        return None
+
+    def _lease(self, worker):
+        if not self.running:
+            return {"job": None}
+        job = self.queue.pop(timeout=0)
+        if job is None:
+            return {"job": None}
+        with self.lock:
+            self.leases[job.id] = (job, worker)
+            self.lease_seen[job.id] = time.monotonic()
+        job.status = "running"
+        self._log(f"➡ {os.path.basename(job.path)} → {worker}")
+        return {"job": {"id": job.id, "path": job.path,
+                        "outfile": job.outfile, "args": job.args}}
+
+    def _result(self, worker, body):
+        job_id = body.get("job_id")
+        with self.lock:
+            lease = self.leases.get(job_id)
+            if not lease or lease[1] != worker:
+                return {"ok": False}        # stale: job was requeued elsewhere
+            del self.leases[job_id]
+            self.lease_seen.pop(job_id, None)
+            self.progress.pop(job_id, None)
+            self.pending -= 1
+            finished = self.pending == 0
+
+        job = lease[0]
+        job.returncode = body.get("returncode")
+        job.status = "done" if job.returncode == 0 else "failed"
+        if job.status == "failed":
+            for line in body.get("log_tail", [])[-3:]:
+                self._log(f"   {worker}: {line}")
+        self._log(f"{'✅' if job.status == 'done' else '❌'} {os.path.basename(job.path)} on {worker}")
+
+        if self.on_job_done:
+            self.on_job_done(job)
+        if finished and self.on_finished:
+            self.on_finished()
+        return {"ok": True}
+
+    def _heartbeat(self, worker, reported):
+        now = time.monotonic()
+        requeue = []
+        with self.lock:
+            for job_id, sec in reported.items():
+                if self.leases.get(job_id, (None, None))[1] == worker:
+                    self.progress[job_id] = sec
+                    self.lease_seen[job_id] = now
+            # Tell the worker which of its jobs it no longer owns
+            lost = [j for j in reported if self.leases.get(j, (None, None))[1] != worker]
+
+            # A live worker that stops reporting a lease lost the /lease reply
+            # or its /result post: hand the job out again
+            for job_id, (job, owner) in list(self.leases.items()):
+                if owner == worker and job_id not in reported \
+                        and now - self.lease_seen.get(job_id, now) > FARM_LEASE_GRACE:
+                    self._drop_lease(job_id)
+                    requeue.append(job)
+
+        for job in requeue:
+            self._requeue(job, f"{worker} no longer reports")
+        return {"ok": True, "cancel": lost}
+
+    def _drop_lease(self, job_id):
+        # Caller holds self.lock
+        del self.leases[job_id]
+        self.lease_seen.pop(job_id, None)
+        self.progress.pop(job_id, None)
+
+    def _requeue(self, job, why):
+        job.status = "queued"
+        self.queue.push(job)
+        self._log(f"♻ {why}, requeued {os.path.basename(job.path)}")
+
+    def _reaper(self):
+        """Requeue jobs held by workers that stopped sending heartbeats."""
+        while self.running:
+            time.sleep(FARM_HEARTBEAT_SECS)
+            now = time.monotonic()
+            with self.lock:
+                dead = [w for w, seen in self.workers.items()
+                        if now - seen > self.worker_timeout]
+                requeue = []
+                for w in dead:
+                    del self.workers[w]
+                    for job_id, (job, owner) in list(self.leases.items()):
+                        if owner == w:
+                            self._drop_lease(job_id)
+                            requeue.append((job, w))
+            for job, w in requeue:
+                self._requeue(job, f"{w} went silent")
+
+
+# ---------------- WORKER ----------------
+
+def parse_path_map(items):
+    """["D:/media=/mnt/media", ...] -> [("d:/media", "/mnt/media"), ...]"""
+    mapping = []
+    for item in items or []:
+        src, _, dst = item.partition("=")
+        mapping.append((src.replace("\\", "/").rstrip("/").lower(), dst.rstrip("/\\")))
+    return mapping
+
+
+def map_path(path, mapping):
+    """Translate a coordinator path to this host's view of the shared storage."""
+    norm = path.replace("\\", "/")
+    for src, dst in mapping:
+        if norm.lower().startswith(src + "/"):
+            return os.path.join(dst, *norm[len(src) + 1:].split("/"))
+    return path
+
+
+def _post(url, path, body, token="", timeout=10):
+    req = urllib.request.Request(url.rstrip("/") + path,
+                                 data=json.dumps(body).encode(),
+                                 headers={"Content-Type": "application/json",
+                                          "X-Farm-Token": token})
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return json.loads(r.read() or b"{}")
+
+
+class FarmWorker:
+    def __init__(self, url, name=None, slots=1, path_map=None, token=FARM_TOKEN,
+                 ffmpeg="ffmpeg"):
+        self.url = url
+        self.token = token
+        self.ffmpeg = ffmpeg
+        self.name = name or socket.gethostname()
+        self.slots = max(1, slots)
+        self.path_map = path_map or []
+        self.progress = {}
+        self.procs = {}
+        self.lock = threading.Lock()
+        self.running = True
+
+    def run(self):
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+        threads = [threading.Thread(target=self._slot, daemon=True)
+                   for _ in range(self.slots)]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            self.running = False
+
+    def _heartbeat(self):
+        while self.running:
+            with self.lock:
+                progress = dict(self.progress)
+            try:
+                reply = _post(self.url, "/heartbeat",
+                              {"worker": self.name, "progress": progress}, self.token)
+                for job_id in reply.get("cancel", []):
+                    self._kill(job_id)
+            except OSError:
+                pass
+            time.sleep(FARM_HEARTBEAT_SECS)
+
+    def _kill(self, job_id):
+        with self.lock:
+            p = self.procs.get(job_id)
+        if p and p.poll() is None:
+            p.kill()
+
+    def _slot(self):
+        while self.running:
+            try:
+                job = _post(self.url, "/lease", {"worker": self.name}, self.token).get("job")
+            except OSError:
+                job = None
+            if not job:
+                time.sleep(2)
+                continue
+
+            job_id = job["id"]
+            infile = map_path(job["path"], self.path_map)
+            outfile = map_path(job["outfile"], self.path_map)
+            os.makedirs(os.path.dirname(outfile) or ".", exist_ok=True)
+            tail = collections.deque(maxlen=20)
+
+            # Reported from now on, so the lease stays ours while we set up
+            with self.lock:
+                self.progress[job_id] = 0
+
+            # Stall detection only: the worker doesn't know the duration
+            watch = watchdog.watch()
+
+            def progress(sec, job_id=job_id):
+                watch.progress(sec)
+                with self.lock:
+                    self.progress[job_id] = sec
+
+            def started(proc, job_id=job_id):
+                watch.attach(proc)
+                with self.lock:
+                    self.procs[job_id] = proc
+                    self.progress[job_id] = 0
+
+            try:
+                p = run_ffmpeg(infile, outfile, job["args"], on_progress=progress,
+                               on_log=tail.append, on_start=started, ffmpeg=self.ffmpeg)
+                rc = p.wait()
+            except OSError as e:
+                tail.append(str(e))
+                rc = -1
+            finally:
+                watchdog.release(watch)
+            if watch.reason:
+                tail.append(f"killed by supervisor: {watch.reason}")
+
+            with self.lock:
+                self.procs.pop(job_id, None)
+                self.progress.pop(job_id, None)
+            try:
+                _post(self.url, "/result", {"worker": self.name, "job_id": job_id,
+                                            "returncode": rc, "log_tail": list(tail)}, self.token)
+            except OSError:
+                pass    # no longer reported: coordinator requeues after FARM_LEASE_GRACE
+
+
+# ---------------- CLI ----------------
+
+def main():
+    ap = argparse.ArgumentParser(description="FFmpeg encoding farm")
+    sub = ap.add_subparsers(dest="mode", required=True)
+
+    c = sub.add_parser("coordinator")
+    c.add_argument("--folder", required=True)
+    c.add_argument("--preset", required=True)
+    c.add_argument("--out")
+    c.add_argument("--host", default=FARM_HOST)
+    c.add_argument("--port", type=int, default=FARM_PORT)
+    c.add_argument("--token", default=os.environ.get("FARM_TOKEN", FARM_TOKEN))
+
+    w = sub.add_parser("worker")
+    w.add_argument("--url", required=True)
+    w.add_argument("--name")
+    w.add_argument("--slots", type=int, default=1)
+    w.add_argument("--token", default=os.environ.get("FARM_TOKEN", FARM_TOKEN))
+    w.add_argument("--ffmpeg", default="ffmpeg", help="FFmpeg binary on this host")
+    w.add_argument("--map", action="append", default=[],
+                   help="coordinator_prefix=local_prefix for shared storage")
+
+    opts = ap.parse_args()
+
+    if opts.mode == "worker":
+        FarmWorker(opts.url, opts.name, opts.slots, parse_path_map(opts.map), opts.token,
+                   opts.ffmpeg).run()
+        return
+
+    from audio_pipeline import output_ext
+    from presets import get_presets
+    from file_manager import scan_folder, build_output_name
+
+    args = get_presets()[opts.preset]["args"]
+    done = threading.Event()
+    coord = Coordinator(host=opts.host, port=opts.port, token=opts.token,
+                        on_log=print, on_finished=done.set)
+    files = scan_folder(opts.folder)
+    for path in files:
+        outfile = build_output_name(path, opts.out, ext=output_ext(args))
+        coord.submit(Job(path, outfile, args, preset=opts.preset))
+    coord.start()
+    print(f"{len(files)} jobs queued")
+    if files:
+        done.wait()
+    coord.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# ffmpeg_args.py
+# Helpers to read and rewrite preset FFmpeg argument strings
+
+import shlex
+
+# Options that are flags (take no value) in our presets
+FLAG_OPTS = ("-vn", "-an", "-sn", "-dn", "-y", "-n")
+
+# Aliases FFmpeg accepts for the same stream option
+ALIASES = {
+    "-vcodec": "-c:v",
+    "-acodec": "-c:a",
+    "-filter:v": "-vf",
+    "-filter:a": "-af",
+}
+
+
+def split_args(args):
+    """Split an args string into (option, value) pairs. Flags get value None."""
+    tokens = shlex.split(args or "")
+    pairs = []
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok.startswith("-") and tok not in FLAG_OPTS and i + 1 < len(tokens):
+            pairs.append((ALIASES.get(tok, tok), tokens[i + 1]))
+            i += 2
+        else:
+            pairs.append((ALIASES.get(tok, tok), None))
+            i += 1
+    return pairs
+
+
+def join_args(pairs):
+    out = []
+    for opt, val in pairs:
+        out.append(opt)
+        if val is not None:
+            out.append(shlex.quote(val) if _needs_quote(val) else val)
+    return " ".join(out)
+
+
+def _needs_quote(val):
+    return any(c in val for c in " \"'")
+
+
+def get_opt(args, opt, default=None):
+    for o, v in split_args(args):
+        if o == opt:
+            return v
+    return default
+
+
+def has_opt(args, opt):
+    return any(o == opt for o, _ in split_args(args))
+
+
+def set_opt(args, opt, value):
+    """Replace (or append) an option. value=None writes a flag."""
+    pairs = split_args(args)
+    for i, (o, _) in enumerate(pairs):
+        if o == opt:
+            pairs[i] = (opt, value)
+            return join_args(pairs)
+    pairs.append((opt, value))
+    return join_args(pairs)
+
+
+def remove_opts(args, *opts):
+    return join_args([(o, v) for o, v in split_args(args) if o not in opts])
+
+
+def video_codec(args):
+    """Video codec requested by the args: None (not set), 'copy', encoder name or 'none' for -vn."""
+    pairs = split_args(args)
+    for o, v in pairs:
+        if o == "-vn":
+            return "none"
+    for o, v in pairs:
+        if o == "-c:v":
+            return v
+        if o == "-c":
+            return v
+    return None
+
+
+def audio_codec(args):
+    pairs = split_args(args)
+    for o, v in pairs:
+        if o == "-an":
+            return "none"
+    for o, v in pairs:
+        if o == "-c:a":
+            return v
+        if o == "-c":
+            return v
+    return None
+
+
+def parse_kbps(value):
+    """'2500k' -> 2500, '2M' -> 2000, '900000' -> 900."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    try:
+        if value.endswith("k"):
+            return int(float(value[:-1]))
+        if value.endswith("m"):
+            return int(float(value[:-1]) * 1000)
+        return int(float(value) / 1000)
+    except ValueError:
+        return None
@@ -1,24 +1,38 @@
 # ffmpeg_runner.py
 # Module to run FFmpeg commands and track progress
 
-import subprocess, re, os, signal
+import subprocess, re, os, signal, shlex
+
+from config import FFMPEG_PATH
 
 TIME_RE = re.compile(r"time=(\d+):(\d+):(\d+\.\d+)")
+SPEED_RE = re.compile(r"speed=\s*(\d+(?:\.\d+)?)x")
+
+# New process group so a stop/close can signal FFmpeg without hitting the GUI
+CREATE_FLAGS = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+
+
+def build_command(infile, outfile, args, ffmpeg=None):
+    """argv for one encode; ffmpeg overrides the configured binary (farm workers)."""
+    return [ffmpeg or FFMPEG_PATH, "-y", "-i", infile] + shlex.split(args) + [outfile]
 
-def run_ffmpeg(infile, outfile, args, on_progress=None, on_log=None):
-    cmd = f'"{infile}"'
 
-    full_cmd = f'ffmpeg -y -i "{infile}" {args} "{outfile}"'
+def run_ffmpeg(infile, outfile, args, on_progress=None, on_log=None, on_start=None,
+               cwd=None, on_speed=None, ffmpeg=None):
+    full_cmd = build_command(infile, outfile, args, ffmpeg)
 
     proc = subprocess.Popen(
         full_cmd,
-        shell=True,
-        stdout=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
         stderr=subprocess.PIPE,
         text=True,
-        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+        cwd=cwd,
+        creationflags=CREATE_FLAGS
     )
 
+    if on_start:
+        on_start(proc)
+
     for line in proc.stderr:
         if on_log:
             on_log(line.strip())
@@ -29,4 +43,17 @@ def run_ffmpeg(infile, outfile, args, on_progress=None, on_log=None):
             sec = int(h) * 3600 + int(m_) * 60 + float(s)
             on_progress(sec)
 
+        m = SPEED_RE.search(line)
+        if m and on_speed:
+            on_speed(float(m.group(1)))
+
+    # Release the pipe now rather than whenever the Popen is collected
+    proc.stderr.close()
     return proc
+
+
+def low_priority_kwargs():
+    """Popen kwargs that run a helper FFmpeg below normal priority."""
+    if os.name == "nt":
+        return {"creationflags": getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0)}
+    return {"preexec_fn": lambda: os.nice(10)}
@@ -2,8 +2,9 @@
 # File management utilities for video processing
 # Uses FFprobe to extract video metadata
 
-import os, subprocess
-from config import VIDEO_EXTS, FFPROBE_PATH
+import os, subprocess, json, threading, hashlib
+from collections import OrderedDict
+from config import VIDEO_EXTS, FFPROBE_PATH, META_CACHE_MAX, HELPER_TIMEOUT_SECS
 
 def scan_folder(folder):
     return [
@@ -13,14 +14,15 @@ def scan_folder(folder):
     ]
 
 
-def build_output_name(infile, out_dir=None, rename=True):
+def build_output_name(infile, out_dir=None, rename=True, ext=".mp4", make_dirs=True):
     base = os.path.splitext(os.path.basename(infile))[0]
     if rename:
         base += "_converted"
     if not out_dir:
         out_dir = os.path.dirname(infile)
-    os.makedirs(out_dir, exist_ok=True)
-    return os.path.join(out_dir, base + ".mp4")
+    if make_dirs:
+        os.makedirs(out_dir, exist_ok=True)
+    return os.path.join(out_dir, base + ext)
 
 
 def get_resolution(path):
@@ -32,7 +34,7 @@ def get_resolution(path):
             "-show_entries", "stream=width,height",
             "-of", "csv=p=0",
             path
-        ])
+        ], timeout=HELPER_TIMEOUT_SECS)
         return out.decode().strip()
     except Exception:
         return "unknown"
@@ -43,8 +45,139 @@ def get_duration(path):
             FFPROBE_PATH, "-v", "error",
             "-show_entries", "format=duration",
             "-of", "csv=p=0", path
-        ])
+        ], timeout=HELPER_TIMEOUT_SECS)
         return float(out.decode().strip())
     except:
         return 0
-    
\ No newline at end of file
+
+
+# ---------------- PROBE CACHE ----------------
+# Keyed by absolute path, validated by (size, mtime) so edits re-probe.
+# Least recently used entries are dropped past META_CACHE_MAX.
+
+_meta_cache = OrderedDict()
+_meta_lock = threading.Lock()
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
+
+def get_metadata(path):
+    """Cached per-file metadata dict (probe results and anything else keyed to the file)."""
+    path = os.path.abspath(path)
+    try:
+        key = _stat_key(path)
+    except OSError:
+        return {}
+    with _meta_lock:
+        entry = _meta_cache.get(path)
+        if not entry or entry["_key"] != key:
+            entry = {"_key": key}
+            _meta_cache[path] = entry
+            if len(_meta_cache) > META_CACHE_MAX:
+                _meta_cache.popitem(last=False)
+        else:
+            _meta_cache.move_to_end(path)
+        return entry
+
+
+FINGERPRINT_CHUNK = 64 * 1024
+
+
+def file_fingerprint(path):
+    """Cheap content fingerprint: size + hash of the first and last 64 KiB (cached).
+
+    Independent of the file name, so renamed copies share a fingerprint.
+    """
+    meta = get_metadata(path)
+    if "fingerprint" in meta:
+        return meta["fingerprint"]
+
+    try:
+        size = os.path.getsize(path)
+        h = hashlib.blake2b(str(size).encode(), digest_size=16)
+        with open(path, "rb") as f:
+            h.update(f.read(FINGERPRINT_CHUNK))
+            if size > FINGERPRINT_CHUNK:
+                f.seek(max(size - FINGERPRINT_CHUNK, FINGERPRINT_CHUNK))
+                h.update(f.read(FINGERPRINT_CHUNK))
+    except OSError:
+        return None
+
+    meta["fingerprint"] = h.hexdigest()
+    return meta["fingerprint"]
+
+
+def probe_media(path):
+    """Probe codecs, resolution, bitrate and container of a file (cached).
+
+    Returns {} when ffprobe fails.
+    """
+    meta = get_metadata(path)
+    if "probe" in meta:
+        return meta["probe"]
+
+    try:
+        out = subprocess.check_output([
+            FFPROBE_PATH, "-v", "error",
+            "-show_entries",
+            "format=format_name,duration,bit_rate:"
+            "stream=codec_type,codec_name,width,height,bit_rate,pix_fmt,avg_frame_rate",
+            "-of", "json", path
+        ], timeout=HELPER_TIMEOUT_SECS)
+        raw = json.loads(out.decode("utf-8", "replace"))
+    except Exception:
+        return {}
+
+    fmt = raw.get("format", {})
+    info = {
+        "format": fmt.get("format_name", ""),
+        "duration": _to_float(fmt.get("duration")),
+        "bit_rate": _to_int(fmt.get("bit_rate")),
+        "video": None,
+        "audio": None,
+    }
+    for s in raw.get("streams", []):
+        kind = s.get("codec_type")
+        if kind == "video" and info["video"] is None:
+            info["video"] = {
+                "codec": s.get("codec_name"),
+                "width": _to_int(s.get("width")),
+                "height": _to_int(s.get("height")),
+                "bit_rate": _to_int(s.get("bit_rate")),
+                "pix_fmt": s.get("pix_fmt"),
+                "fps": _to_rate(s.get("avg_frame_rate")),
+            }
+        elif kind == "audio" and info["audio"] is None:
+            info["audio"] = {
+                "codec": s.get("codec_name"),
+                "bit_rate": _to_int(s.get("bit_rate")),
+            }
+
+    meta["probe"] = info
+    return info
+
+
+def _to_int(v):
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_rate(v):
+    """ffprobe rate string ("30000/1001") -> float, 0.0 if unknown."""
+    num, _, den = str(v or "").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _to_float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,146 @@
+# job_queue.py
+# Batch job model and priority queue with ordering policies
+# Jobs can be reprioritized / pinned while a batch is running
+
+import heapq
+import itertools
+import threading
+
+from estimations import preset_cost
+
+_seq = itertools.count()
+
+
+class Job:
+    def __init__(self, path, outfile, args, preset=None, priority=0, pinned=False):
+        self.id = path
+        self.path = path
+        self.outfile = outfile
+        self.args = args
+        self.preset = preset
+        self.priority = priority
+        self.pinned = pinned
+        self.duration = 0.0
+        self.target_mb = None      # set -> two-pass target-size encode
+        self.target_kbps = None    # set -> two-pass at this video bitrate (wins over target_mb)
+        self.auto_crf = False      # pick CRF per file from sampled quality
+        self.plugins = {}          # kind -> plugin name (probe / executor / post_step)
+        self.duplicates = []       # (path, outfile) of identical inputs sharing this encode
+        self.status = "queued"
+        self.speed = None
+        self.returncode = None
+        self.error = None          # failure kind from the supervisor (stalled, corrupt_input, ...)
+        self.fallback = None       # failure kind that made the fallback preset run instead
+        self.seq = next(_seq)
+        self._cost = None
+
+    @property
+    def cost(self):
+        """Expected work: probed duration x relative preset cost."""
+        key = (self.duration, self.args)
+        if not self._cost or self._cost[0] != key:
+            self._cost = (key, self.duration * preset_cost(self.args))
+        return self._cost[1]
+
+
+class JobQueue:
+    """Thread-safe job queue. Priority / pin / duration / policy changes apply
+    immediately to waiting jobs.
+
+    Jobs sit in a heap keyed by policy. A change re-pushes the job under a new
+    version and the old entry is skipped when it surfaces (a policy change
+    rebuilds the heap), so pop is O(log n) however many jobs are waiting.
+    """
+
+    def __init__(self, policy="fifo"):
+        self.policy = policy
+        self.jobs = {}
+        self.closed = False
+        self.cond = threading.Condition()
+        self._heap = []
+        self._version = {}      # job id -> version of its live heap entry
+
+    def _key(self, job):
+        if self.policy == "sjf":
+            order = job.cost
+        elif self.policy == "ljf":
+            order = -job.cost
+        else:
+            order = 0
+        return (not job.pinned, -job.priority, order, job.seq)
+
+    def _push_entry(self, job):
+        version = self._version.get(job.id, 0) + 1
+        self._version[job.id] = version
+        heapq.heappush(self._heap, (self._key(job), version, job.id))
+        # Stale entries are dropped in bulk once they outnumber live ones
+        if len(self._heap) > 2 * len(self.jobs) + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._version = {job_id: 1 for job_id in self.jobs}
+        self._heap = [(self._key(job), 1, job.id) for job in self.jobs.values()]
+        heapq.heapify(self._heap)
+
+    def push(self, job):
+        with self.cond:
+            self.jobs[job.id] = job
+            self._push_entry(job)
+            self.cond.notify()
+
+    def pop(self, timeout=None):
+        """Next job by policy, or None once the queue is closed and drained."""
+        with self.cond:
+            while not self.jobs:
+                if self.closed:
+                    return None
+                if not self.cond.wait(timeout):
+                    return None
+            while True:
+                _, version, job_id = heapq.heappop(self._heap)
+                if job_id in self.jobs and self._version.get(job_id) == version:
+                    del self._version[job_id]
+                    return self.jobs.pop(job_id)
+
+    def set_policy(self, policy):
+        with self.cond:
+            if policy != self.policy:
+                self.policy = policy
+                self._rebuild()
+
+    def _update(self, job_id, attr, value):
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is not None and getattr(job, attr) != value:
+                setattr(job, attr, value)
+                self._push_entry(job)
+
+    def set_priority(self, job_id, priority):
+        self._update(job_id, "priority", priority)
+
+    def set_pinned(self, job_id, pinned):
+        self._update(job_id, "pinned", pinned)
+
+    def set_duration(self, job_id, duration):
+        self._update(job_id, "duration", duration)
+
+    def remove(self, job_id):
+        with self.cond:
+            self._version.pop(job_id, None)
+            return self.jobs.pop(job_id, None)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def clear(self):
+        with self.cond:
+            self.jobs.clear()
+            self._heap.clear()
+            self._version.clear()
+            self.cond.notify_all()
+
+    def __len__(self):
+        with self.cond:
+            return len(self.jobs)
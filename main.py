@@ -2,7 +2,13 @@
 # Entry point for FFmpeg Modular GUI Application
 
 import tkinter as tk
-from ui_main import FFmpegGUI
+
+
+def build_gui(root):
+    # Imported after the window is mapped so it shows up immediately
+    from ui_main import FFmpegGUI
+    FFmpegGUI(root)
+
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -12,5 +18,5 @@ if __name__ == "__main__":
     root.state("zoomed")              # Windowed fullscreen (recommended)
     # root.attributes("-fullscreen", True)  # True borderless fullscreen
 
-    FFmpegGUI(root)
+    root.after_idle(build_gui, root)
     root.mainloop()
@@ -0,0 +1,199 @@
+# plugins.py
+# Plugin discovery and lazy loading
+#
+# A plugin is a module with a literal PLUGIN_INFO dict:
+#
+#   PLUGIN_INFO = {"name": "my-pack", "kind": "presets", "presets": {...}}
+#
+# kind is one of:
+#   presets    - "presets" holds extra presets (same shape as DEFAULT_PRESETS)
+#   post_step  - module defines run(job, log), called after a successful job
+#   probe      - module defines probe(path), returning probe_media()-style info
+#   executor   - module defines run_job(job, args, on_progress, on_start) -> returncode
+#
+# Presets select engine plugins by name with "post_step" / "probe" / "executor" keys.
+# Plugins come from PLUGIN_DIR (read with ast, never imported for discovery) and
+# from the "ffmpeg_gui.plugins" entry-point group. The result is cached in
+# PLUGIN_MANIFEST; a plugin module is only imported when a job selects it.
+
+import json
+import os
+import sys
+import threading
+
+from config import PLUGIN_DIR, PLUGIN_MANIFEST
+
+ENTRY_POINT_GROUP = "ffmpeg_gui.plugins"
+KINDS = ("presets", "post_step", "probe", "executor")
+
+_manifest = None
+_loaded = {}
+_lock = threading.Lock()
+
+
+# ---------------- DISCOVERY ----------------
+
+def _plugin_files():
+    if not os.path.isdir(PLUGIN_DIR):
+        return []
+    files = []
+    for name in sorted(os.listdir(PLUGIN_DIR)):
+        path = os.path.join(PLUGIN_DIR, name)
+        if name.endswith(".py"):
+            files.append(path)
+        elif os.path.isfile(os.path.join(path, "__init__.py")):
+            files.append(os.path.join(path, "__init__.py"))
+    return files
+
+
+def _cache_key():
+    """Changes when a plugin file changes or a package is (un)installed.
+
+    Installed distributions are keyed by their *.dist-info / *.egg-info folder
+    names (name + version), not directory mtimes: the app folder is on sys.path
+    and its mtime moves whenever the manifest or any cache file is written.
+    """
+    key = []
+    for path in _plugin_files():
+        st = os.stat(path)
+        key.append([path, st.st_mtime_ns, st.st_size])
+    for entry in sys.path:
+        try:
+            dists = sorted(n for n in os.listdir(entry or ".")
+                           if n.endswith((".dist-info", ".egg-info")))
+        except OSError:
+            continue
+        if dists:
+            key.append([entry, dists])
+    return key
+
+
+def _read_info(path):
+    """PLUGIN_INFO from a plugin file without importing it."""
+    import ast
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+    except (OSError, SyntaxError):
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id == "PLUGIN_INFO" for t in node.targets):
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+
+def _entry_points():
+    from importlib.metadata import entry_points
+
+    try:
+        return list(entry_points(group=ENTRY_POINT_GROUP))
+    except TypeError:       # Python < 3.10
+        return list(entry_points().get(ENTRY_POINT_GROUP, []))
+
+
+def _scan():
+    plugins = {}
+
+    for path in _plugin_files():
+        info = _read_info(path)
+        if not info or info.get("kind") not in KINDS:
+            continue
+        name = info.get("name") or os.path.splitext(os.path.basename(path))[0]
+        plugins[name] = {"kind": info["kind"], "path": os.path.abspath(path),
+                         "presets": info.get("presets", {})}
+
+    # Installed plugins have to be imported once to read their info; the
+    # manifest keeps it until the environment changes
+    for ep in _entry_points():
+        try:
+            info = getattr(ep.load(), "PLUGIN_INFO", None)
+        except Exception:
+            continue
+        if not info or info.get("kind") not in KINDS:
+            continue
+        plugins[info.get("name") or ep.name] = {
+            "kind": info["kind"], "entry_point": ep.name,
+            "presets": info.get("presets", {})}
+
+    return plugins
+
+
+def manifest():
+    global _manifest
+    with _lock:
+        if _manifest is not None:
+            return _manifest
+
+        key = _cache_key()
+        try:
+            with open(PLUGIN_MANIFEST, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("key") == key:
+                _manifest = data["plugins"]
+                return _manifest
+        except (OSError, ValueError):
+            pass
+
+        _manifest = _scan()
+        try:
+            with open(PLUGIN_MANIFEST, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "plugins": _manifest}, f, indent=2)
+        except OSError:
+            pass
+        return _manifest
+
+
+def rescan():
+    global _manifest
+    with _lock:
+        _manifest = None
+    try:
+        os.remove(PLUGIN_MANIFEST)
+    except OSError:
+        pass
+    return manifest()
+
+
+# ---------------- ACCESS ----------------
+
+def plugin_presets():
+    """Presets contributed by preset-pack plugins (read from the manifest only)."""
+    presets = {}
+    for name, p in manifest().items():
+        if p["kind"] != "presets":
+            continue
+        for key, preset in p["presets"].items():
+            preset = dict(preset)
+            preset.setdefault("category", "Plugin")
+            preset["plugin"] = name
+            presets[key] = preset
+    return presets
+
+
+def load_plugin(name, kind=None):
+    """Import a plugin module on first use. Returns None if unknown."""
+    with _lock:
+        if name in _loaded:
+            return _loaded[name]
+
+    p = manifest().get(name)
+    if not p or (kind and p["kind"] != kind):
+        return None
+
+    if "path" in p:
+        import importlib.util
+
+        spec = importlib.util.spec_from_file_location(f"ffmpeg_gui_plugin_{name}", p["path"])
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = next(ep for ep in _entry_points() if ep.name == p["entry_point"]).load()
+
+    with _lock:
+        _loaded[name] = module
+    return module
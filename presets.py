@@ -1,8 +1,10 @@
 # presets.py
 # Preset management for FFmpeg command-line arguments Loads, saves, and merges default presets
 
-import json, os
+import json, os, threading
 from config import PRESET_FILE
+from plugins import plugin_presets
+
 DEFAULT_PRESETS = {
 
     # ---------- COPY / REWRAP ----------
@@ -134,6 +136,20 @@ DEFAULT_PRESETS = {
 }
 
 def load_presets():
+    data, changed = _read_presets()
+    if changed:
+        save_presets(data)
+    return _with_plugins(data)
+
+
+def _with_plugins(data):
+    # Plugin presets are never written to PRESET_FILE; user presets win on name clashes
+    merged = plugin_presets()
+    merged.update(data)
+    return merged
+
+
+def _read_presets():
     data = {}
 
     if os.path.exists(PRESET_FILE):
@@ -147,13 +163,36 @@ def load_presets():
             data[k] = v
             changed = True
 
-    if changed:
-        save_presets(data)
+    return data, changed
+
+
+# ---------------- CACHED PATH (startup) ----------------
+# Re-read only when the file's (size, mtime) changes, and write merged
+# defaults back off the UI thread so the window isn't held up by disk I/O.
+
+_cache = {"key": None, "data": None}
+
+
+def _file_key():
+    try:
+        st = os.stat(PRESET_FILE)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
 
-    return data
 
+def get_presets():
+    key = _file_key()
+    if _cache["data"] is None or _cache["key"] != key:
+        data, changed = _read_presets()
+        _cache["key"], _cache["data"] = key, data
+        if changed:
+            threading.Thread(target=save_presets, args=(dict(data),), daemon=True).start()
+    return _with_plugins(_cache["data"])
 
 
 def save_presets(data):
+    data = {k: v for k, v in data.items() if "plugin" not in v}
     with open(PRESET_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+        json.dump(data, f, indent=2)
+    _cache["key"], _cache["data"] = _file_key(), dict(data)
@@ -0,0 +1,130 @@
+# preview_cache.py
+# Thumbnail and preview frames, decoded once and kept in a size-bounded disk cache
+# Cache entries are keyed by file fingerprint, so renames/moves still hit
+
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+
+from config import FFMPEG_PATH, PREVIEW_CACHE_DIR, PREVIEW_CACHE_MB, HELPER_TIMEOUT_SECS
+from ffmpeg_runner import low_priority_kwargs
+from file_manager import file_fingerprint, probe_media
+
+THUMB_COUNT = 5
+THUMB_WIDTH = 80
+
+
+class PreviewCache:
+    def __init__(self, root=PREVIEW_CACHE_DIR, max_mb=PREVIEW_CACHE_MB):
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, name):
+        path = os.path.join(self.entry_dir(key), name)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(self.entry_dir(key))       # LRU touch
+        except OSError:
+            pass
+        return path
+
+    def reserve(self, key):
+        d = self.entry_dir(key)
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits its budget."""
+        with self.lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                d = os.path.join(self.root, name)
+                if not os.path.isdir(d):
+                    continue
+                size = sum(e.stat().st_size for e in os.scandir(d) if e.is_file())
+                entries.append((os.path.getmtime(d), size, d))
+                total += size
+
+            for _, size, d in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(d, ignore_errors=True)
+                total -= size
+
+
+def _run(cmd):
+    # A hung decode must not block the single preview worker forever
+    try:
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              timeout=HELPER_TIMEOUT_SECS, **low_priority_kwargs()).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def extract_thumbnails(cache, path, count=THUMB_COUNT, width=THUMB_WIDTH):
+    """Representative frames for a file, in one keyframe-only FFmpeg pass.
+
+    Returns the list of PNG paths (possibly empty).
+    """
+    key = file_fingerprint(path)
+    if not key:
+        return []
+
+    names = [f"thumb_{i:02d}.png" for i in range(1, count + 1)]
+    cached = [cache.get(key, n) for n in names]
+    if cached[0]:
+        return [c for c in cached if c]
+
+    duration = probe_media(path).get("duration") or 0
+    if duration <= 0:
+        return []
+
+    out_dir = cache.reserve(key)
+    ok = _run([
+        FFMPEG_PATH, "-v", "error", "-y",
+        "-skip_frame", "nokey", "-i", path,
+        "-an", "-sn", "-dn",
+        "-vf", f"fps={count}/{duration:.3f},scale={width}:-2",
+        "-fps_mode", "vfr", "-frames:v", str(count),
+        os.path.join(out_dir, "thumb_%02d.png")
+    ])
+    cache.evict()
+
+    if not ok:
+        return []
+    return [p for p in (cache.get(key, n) for n in names) if p]
+
+
+def render_filter_preview(cache, path, vf, at=None):
+    """One frame of the file run through a preset's -vf chain (cached per filter)."""
+    key = file_fingerprint(path)
+    if not key:
+        return None
+
+    vf = vf or "null"
+    name = "filter_" + hashlib.sha1(vf.encode()).hexdigest()[:16] + ".png"
+    cached = cache.get(key, name)
+    if cached:
+        return cached
+
+    if at is None:
+        at = (probe_media(path).get("duration") or 0) / 3
+
+    out = os.path.join(cache.reserve(key), name)
+    ok = _run([
+        FFMPEG_PATH, "-v", "error", "-y",
+        "-ss", f"{at:.3f}", "-i", path,
+        "-an", "-sn", "-dn",
+        "-vf", vf, "-frames:v", "1", out
+    ])
+    cache.evict()
+    return out if ok and os.path.exists(out) else None
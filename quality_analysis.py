@@ -0,0 +1,199 @@
+# quality_analysis.py
+# Automatic CRF selection: encode short sample clips at several CRFs in parallel,
+# score them against the source (libvmaf if available, else ssim) and keep the
+# smallest encode that meets the quality floor. Scores are cached per file.
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (FFMPEG_PATH, QUALITY_CACHE_FILE, QUALITY_FLOOR_SSIM,
+                    QUALITY_FLOOR_VMAF, CRF_CANDIDATES, HELPER_TIMEOUT_SECS)
+from ffmpeg_args import split_args, join_args, get_opt, has_opt, set_opt
+from ffmpeg_runner import low_priority_kwargs
+from file_manager import file_fingerprint, probe_media
+
+SAMPLE_POINTS = (0.2, 0.5, 0.8)     # fraction of the duration
+SAMPLE_SECS = 4
+ANALYSIS_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+SSIM_RE = re.compile(r"All:(\d+(?:\.\d+)?)")
+VMAF_RE = re.compile(r"VMAF score[:=]\s*(\d+(?:\.\d+)?)")
+
+_cache_lock = threading.Lock()
+_cache = None
+_vmaf = None
+
+
+def quality_opt(args):
+    """The option that sets constant quality in this preset, or None."""
+    for opt in ("-crf", "-global_quality"):
+        if has_opt(args, opt):
+            return opt
+    return None
+
+
+def has_vmaf():
+    global _vmaf
+    if _vmaf is None:
+        try:
+            out = subprocess.run([FFMPEG_PATH, "-hide_banner", "-filters"],
+                                 capture_output=True, text=True,
+                                 timeout=HELPER_TIMEOUT_SECS).stdout
+            _vmaf = " libvmaf " in out
+        except (OSError, subprocess.SubprocessError):
+            _vmaf = False
+    return _vmaf
+
+
+# ---------------- CACHE ----------------
+# Read once per process, kept in memory, rewritten atomically on each new entry
+
+def _load_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                with open(QUALITY_CACHE_FILE, "r", encoding="utf-8") as f:
+                    _cache = json.load(f)
+            except (OSError, ValueError):
+                _cache = {}
+        return _cache
+
+
+def _save_entry(key, entry):
+    data = _load_cache()
+    with _cache_lock:
+        data[key] = entry
+        tmp = QUALITY_CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, QUALITY_CACHE_FILE)
+
+
+# ---------------- SAMPLING ----------------
+
+def _run(cmd):
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True,
+                              timeout=HELPER_TIMEOUT_SECS, **low_priority_kwargs())
+    except (OSError, subprocess.SubprocessError) as e:
+        # Missing FFmpeg or a hung run: same shape as a failed run, the clip is dropped
+        return subprocess.CompletedProcess(cmd, -1, "", str(e))
+
+
+def _encode_clip(path, start, args, opt, value, out):
+    # Video only; audio settings don't affect the picture
+    pairs = [(o, v) for o, v in split_args(set_opt(args, opt, str(value)))
+             if o not in ("-c:a", "-b:a", "-af", "-movflags")]
+    r = _run([FFMPEG_PATH, "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", str(SAMPLE_SECS),
+              "-i", path, "-an"] + _argv(pairs) + [out])
+    return r.returncode == 0 and os.path.exists(out)
+
+
+def _argv(pairs):
+    argv = []
+    for o, v in pairs:
+        argv.append(o)
+        if v is not None:
+            argv.append(v)
+    return argv
+
+
+def _score_clip(path, start, vf, encoded, metric):
+    # The reference goes through the preset's filters so sizes match
+    ref = f"{vf}," if vf else ""
+    if metric == "vmaf":
+        graph = (f"[0:v]setpts=PTS-STARTPTS[d];[1:v]{ref}setpts=PTS-STARTPTS[r];"
+                 f"[d][r]libvmaf")
+    else:
+        graph = (f"[0:v]setpts=PTS-STARTPTS[d];[1:v]{ref}setpts=PTS-STARTPTS[r];"
+                 f"[d][r]ssim")
+    r = _run([FFMPEG_PATH, "-hide_banner", "-i", encoded,
+              "-ss", f"{start:.3f}", "-t", str(SAMPLE_SECS), "-i", path,
+              "-lavfi", graph, "-f", "null", "-"])
+    m = (VMAF_RE if metric == "vmaf" else SSIM_RE).search(r.stderr)
+    return float(m.group(1)) if m else None
+
+
+def analyze(path, args, on_log=None):
+    """Score every candidate CRF on sample clips (cached per file fingerprint).
+
+    Returns {"metric": ..., "scores": {crf: worst clip score}, "bytes": {crf: total size}}.
+    """
+    opt = quality_opt(args)
+    base = join_args([(o, v) for o, v in split_args(args) if o != opt])
+    fp = file_fingerprint(path)
+    key = f"{fp}|{base}"
+
+    entry = _load_cache().get(key) if fp else None
+    if entry:
+        return entry
+
+    duration = probe_media(path).get("duration") or 0
+    if duration < SAMPLE_SECS * 2:
+        starts = [0.0]
+    else:
+        starts = [max(0.0, duration * p - SAMPLE_SECS / 2) for p in SAMPLE_POINTS]
+
+    metric = "vmaf" if has_vmaf() else "ssim"
+    vf = get_opt(args, "-vf")
+    tmp = tempfile.mkdtemp(prefix="crf_")
+
+    def work(task):
+        i, start, value = task
+        out = os.path.join(tmp, f"s{i}_{value}.mkv")
+        if not _encode_clip(path, start, args, opt, value, out):
+            return value, None, 0
+        return value, _score_clip(path, start, vf, out, metric), os.path.getsize(out)
+
+    tasks = [(i, s, v) for i, s in enumerate(starts) for v in CRF_CANDIDATES]
+    clip_scores, sizes = {}, {}
+    try:
+        with ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS) as pool:
+            for value, score, size in pool.map(work, tasks):
+                clip_scores.setdefault(str(value), []).append(score)
+                sizes[str(value)] = sizes.get(str(value), 0) + size
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    # A CRF is only as good as its worst clip; any failed clip disqualifies it
+    scores = {k: None if None in v else min(v) for k, v in clip_scores.items()}
+
+    entry = {"metric": metric, "scores": scores, "bytes": sizes}
+    # Nothing scored means FFmpeg failed (missing filter, timeout, ...), not
+    # that the file is hard to encode: try again next time
+    if all(v is None for v in scores.values()):
+        return entry
+    if fp:
+        _save_entry(key, entry)
+    if on_log:
+        on_log(f"quality: {metric} " + ", ".join(
+            f"{k}={v:.3f}" for k, v in scores.items() if v is not None))
+    return entry
+
+
+def select_crf(path, args, on_log=None):
+    """Smallest-output CRF whose worst sample meets the floor, or None
+    (keep the preset's value) when no sample could be scored."""
+    if not quality_opt(args):
+        return None
+
+    entry = analyze(path, args, on_log)
+    if all(v is None for v in entry["scores"].values()):
+        if on_log:
+            on_log("quality: sample analysis failed, keeping the preset value")
+        return None
+    floor = QUALITY_FLOOR_VMAF if entry["metric"] == "vmaf" else QUALITY_FLOOR_SSIM
+    passing = [k for k, v in entry["scores"].items() if v is not None and v >= floor]
+    if not passing:
+        if on_log:
+            on_log(f"quality: no candidate meets the {entry['metric']} floor {floor}, "
+                   f"using the best, {min(CRF_CANDIDATES)}")
+        return min(CRF_CANDIDATES)
+    return int(min(passing, key=lambda k: entry["bytes"].get(k, 0)))
@@ -0,0 +1,170 @@
+# routing.py
+# Smart stream-copy routing between probe and run_ffmpeg
+# Rewrites streams that already match the preset target to "-c copy"
+
+import os
+
+from ffmpeg_args import (split_args, join_args, get_opt, has_opt, video_codec,
+                         audio_codec, parse_kbps)
+
+# Encoder name -> codec name reported by ffprobe
+ENCODER_CODECS = {
+    "libx264": "h264", "h264_qsv": "h264", "h264_nvenc": "h264", "h264_amf": "h264",
+    "libx265": "hevc", "hevc_qsv": "hevc", "hevc_nvenc": "hevc", "hevc_amf": "hevc",
+    "aac": "aac", "libfdk_aac": "aac",
+    "libmp3lame": "mp3",
+    "libopus": "opus",
+}
+
+# Output extension -> token found in ffprobe's format_name
+CONTAINER_FORMATS = {
+    ".mp4": "mp4", ".m4a": "mp4", ".mov": "mov",
+    ".mkv": "matroska", ".mka": "matroska", ".ts": "mpegts", ".mp3": "mp3",
+}
+
+VIDEO_ENCODE_OPTS = ("-crf", "-preset", "-global_quality", "-pix_fmt", "-vf",
+                     "-b:v", "-maxrate", "-bufsize", "-profile:v", "-tune")
+AUDIO_ENCODE_OPTS = ("-b:a",)
+
+# Anything outside this set (e.g. -async, -af, -fflags) changes the streams in
+# ways we can't compare against, so those presets are never rerouted.
+KNOWN_OPTS = set(VIDEO_ENCODE_OPTS + AUDIO_ENCODE_OPTS) | {
+    "-c:v", "-c:a", "-c", "-vn", "-an", "-movflags"
+}
+
+# Allow some slack before a source bitrate counts as "over target"
+BITRATE_SLACK = 1.10
+
+# Constant-quality presets (-crf / -global_quality) have no bitrate target.
+# A source only counts as matching when it is already no bigger than an
+# encode at the reference quality would be: bits per pixel per frame at
+# REFERENCE_QUALITY. Higher quality values (smaller output) lower the
+# ceiling (x2 per 6 steps); lower values never raise it.
+CQ_BITS_PER_PIXEL = {"h264": 0.04, "hevc": 0.025}
+REFERENCE_QUALITY = {"h264": 23, "hevc": 28}
+DEFAULT_FPS = 30.0
+
+
+def _vf_target(vf):
+    """Return (width, height, ok). ok=False when the filter chain does more than scale/format."""
+    if not vf:
+        return None, None, True
+    width = height = None
+    for f in vf.split(","):
+        name, _, params = f.strip().partition("=")
+        if name == "format":
+            continue
+        if name == "scale":
+            w, _, h = params.partition(":")
+            try:
+                width, height = int(w), int(h)
+            except ValueError:
+                return None, None, False
+            continue
+        return None, None, False
+    return width, height, True
+
+
+def _bitrate_ok(source_bps, target_kbps):
+    if not target_kbps or not source_bps:
+        return True
+    return source_bps / 1000 <= target_kbps * BITRATE_SLACK
+
+
+def _quality_ceiling_kbps(v, codec, args):
+    """Bitrate ceiling for a constant-quality preset, or None if it can't be judged."""
+    opt = "-crf" if has_opt(args, "-crf") else "-global_quality"
+    try:
+        quality = float(get_opt(args, opt))
+    except (TypeError, ValueError):
+        return None
+    if codec not in CQ_BITS_PER_PIXEL or not v.get("width") or not v.get("height"):
+        return None
+    scale = 2 ** (min(0.0, REFERENCE_QUALITY[codec] - quality) / 6)
+    fps = v.get("fps") or DEFAULT_FPS
+    return v["width"] * v["height"] * fps * CQ_BITS_PER_PIXEL[codec] * scale / 1000
+
+
+def video_matches(info, args):
+    v = info.get("video")
+    enc = video_codec(args)
+    if not v or enc in (None, "copy", "none"):
+        return False
+    if ENCODER_CODECS.get(enc) != v.get("codec"):
+        return False
+
+    width, height, ok = _vf_target(get_opt(args, "-vf"))
+    if not ok:
+        return False
+    if width and (width, height) != (v.get("width"), v.get("height")):
+        return False
+
+    target = parse_kbps(get_opt(args, "-b:v")) or parse_kbps(get_opt(args, "-maxrate"))
+    if not target and (has_opt(args, "-crf") or has_opt(args, "-global_quality")):
+        target = _quality_ceiling_kbps(v, v.get("codec"), args)
+        if not target:
+            return False
+    source = v.get("bit_rate") or info.get("bit_rate")
+    if target and not source:
+        return False
+    return _bitrate_ok(source, target)
+
+
+def audio_matches(info, args):
+    a = info.get("audio")
+    enc = audio_codec(args)
+    if not a or enc in (None, "copy", "none"):
+        return False
+    if ENCODER_CODECS.get(enc) != a.get("codec"):
+        return False
+    return _bitrate_ok(a.get("bit_rate"), parse_kbps(get_opt(args, "-b:a")))
+
+
+def container_matches(info, infile, outfile):
+    # ffprobe reports "mov,mp4,m4a,..." for all of those, so the extension decides
+    ext = os.path.splitext(outfile)[1].lower()
+    if os.path.splitext(infile)[1].lower() != ext:
+        return False
+    token = CONTAINER_FORMATS.get(ext)
+    return bool(token) and token in info.get("format", "").split(",")
+
+
+def route_job(info, args, infile, outfile):
+    """Decide how a file should be processed for a preset.
+
+    Returns (action, args, reason) where action is "encode", "copy" or "skip".
+    """
+    if not info:
+        return "encode", args, "no probe data"
+
+    pairs = split_args(args)
+    if any(o not in KNOWN_OPTS for o, _ in pairs):
+        return "encode", args, "preset has stream-altering options"
+
+    copy_v = video_matches(info, args)
+    copy_a = audio_matches(info, args)
+    if not copy_v and not copy_a:
+        return "encode", args, "source differs from target"
+
+    # Output must carry exactly the source streams, untouched, to skip
+    v_same = copy_v or not info.get("video")
+    a_same = copy_a or not info.get("audio")
+    if v_same and a_same and container_matches(info, infile, outfile):
+        return "skip", args, "source already matches target"
+
+    drop = (VIDEO_ENCODE_OPTS if copy_v else ()) + (AUDIO_ENCODE_OPTS if copy_a else ())
+    out = []
+    for o, v in pairs:
+        if o in drop:
+            continue
+        if o == "-c:v" and copy_v:
+            v = "copy"
+        elif o == "-c:a" and copy_a:
+            v = "copy"
+        out.append((o, v))
+
+    if copy_v and copy_a:
+        reason = "video + audio already match, stream-copying"
+    else:
+        reason = f"{'video' if copy_v else 'audio'} already matches, stream-copying"
+    return "copy", join_args(out), reason
@@ -0,0 +1,343 @@
+# stream_packaging.py
+# HLS (and optional DASH) packaging of finished renditions
+#
+# Each input file is one rendition of the same programme. Renditions whose
+# keyframes already give the same segment cuts as the reference are packaged
+# copy-only; the rest are re-encoded with keyframes forced at those cuts.
+# Renditions are packaged in parallel into <out>/<name>/, and package.json
+# records what was done, so adding a rendition later packages only that one
+# and rewrites the master playlist / combined MPD.
+#
+#   python stream_packaging.py OUT_DIR a_1080p.mp4 a_720p.mp4 [--dash] [--seg 6]
+
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (FFMPEG_PATH, FFPROBE_PATH, PACKAGE_SEGMENT_SECS, PACKAGE_WORKERS,
+                    HELPER_TIMEOUT_SECS)
+from file_manager import get_metadata, file_fingerprint, probe_media
+from supervisor import time_budget
+
+MANIFEST = "package.json"
+ALIGN_TOLERANCE = 0.05          # seconds between matching cuts
+
+# Codecs HLS players take as-is; anything else is re-encoded
+HLS_VIDEO = ("h264", "hevc")
+HLS_AUDIO = ("aac", "mp3", "ac3", "eac3")
+
+MPD_NS = "urn:mpeg:dash:schema:mpd:2011"
+
+
+# ---------------- KEYFRAMES / ALIGNMENT ----------------
+
+def keyframe_times(path):
+    """Video keyframe timestamps (cached with the file metadata).
+    Empty when the file could not be read; failures are not cached."""
+    meta = get_metadata(path)
+    if "keyframes" in meta:
+        return meta["keyframes"]
+
+    # A packet scan reads the whole file, so long media gets longer
+    timeout = HELPER_TIMEOUT_SECS + (probe_media(path).get("duration") or 0)
+    try:
+        out = subprocess.check_output([
+            FFPROBE_PATH, "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+        ], timeout=timeout).decode("utf-8", "replace")
+    except Exception:
+        return []
+
+    times = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                times.append(float(pts))
+            except ValueError:
+                pass
+    times.sort()
+    meta["keyframes"] = times
+    return times
+
+
+def segment_cuts(keyframes, seg_secs):
+    """Where the HLS muxer will cut in copy mode: the first keyframe past each
+    multiple of seg_secs. Times are relative to the first keyframe."""
+    if not keyframes:
+        return []
+    t0 = keyframes[0]
+    cuts, n = [], 1
+    for t in keyframes:
+        if t - t0 >= n * seg_secs:
+            cuts.append(round(t - t0, 3))
+            n += 1
+    return cuts
+
+
+def cuts_match(a, b):
+    return len(a) == len(b) and all(abs(x - y) <= ALIGN_TOLERANCE for x, y in zip(a, b))
+
+
+def keyframes_aligned(path, reference, seg_secs=PACKAGE_SEGMENT_SECS):
+    """True when copy mode would cut path at the reference points.
+
+    No cuts on media longer than one segment means the keyframes could not
+    be read, which never counts as aligned.
+    """
+    cuts = segment_cuts(keyframe_times(path), seg_secs)
+    if not cuts and (probe_media(path).get("duration") or 0) > seg_secs:
+        return False
+    return cuts_match(cuts, reference)
+
+
+def reference_cuts(path, seg_secs=PACKAGE_SEGMENT_SECS):
+    """Cuts every rendition is aligned to. When the reference file's keyframes
+    can't be read, plain multiples of seg_secs are used (and forced on encode)."""
+    cuts = segment_cuts(keyframe_times(path), seg_secs)
+    duration = probe_media(path).get("duration") or 0
+    if not cuts and duration > seg_secs:
+        cuts = [float(t) for t in range(seg_secs, int(duration), seg_secs)]
+    return cuts
+
+
+# ---------------- MANIFEST ----------------
+
+def load_manifest(out_dir, seg_secs):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("segment_secs") == seg_secs:
+            return data
+    except (OSError, ValueError):
+        pass
+    # New package, or segment length changed: everything is stale
+    return {"segment_secs": seg_secs, "reference": None, "renditions": {}}
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def rendition_name(path):
+    return re.sub(r"[^\w.-]", "_", os.path.splitext(os.path.basename(path))[0])
+
+
+# ---------------- PER RENDITION ----------------
+
+def _run(cmd, timeout=None):
+    try:
+        r = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return -1, f"timed out after {timeout:.0f}s"
+    except OSError as e:
+        return -1, str(e)
+    lines = r.stderr.strip().splitlines()
+    return r.returncode, lines[-1] if lines else f"exit code {r.returncode}"
+
+
+def _codec_args(info, mode, cuts):
+    if mode == "copy":
+        return ["-c", "copy"]
+
+    kbps = max(300, ((info.get("video") or {}).get("bit_rate")
+                     or info.get("bit_rate") or 3_000_000) // 1000)
+    args = ["-c:v", "libx264", "-preset", "veryfast",
+            "-b:v", f"{kbps}k", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k",
+            "-sc_threshold", "0", "-c:a", "aac", "-b:a", "128k"]
+    if cuts:
+        # Only the forced keyframes may start a segment
+        args += ["-g", "100000", "-force_key_frames", ",".join(f"{t:.3f}" for t in cuts)]
+    return args
+
+
+def _package_hls(src, info, rdir, mode, cuts, seg_secs):
+    os.makedirs(rdir, exist_ok=True)
+    codec = _codec_args(info, mode, cuts)
+    video = info.get("video") or {}
+    budget = time_budget(info.get("duration"), " ".join(codec),
+                         pixels=(video.get("width") or 0) * (video.get("height") or 0))
+    return _run([FFMPEG_PATH, "-hide_banner", "-v", "error", "-y", "-i", src,
+                 "-map", "0:v:0", "-map", "0:a:0?"] + codec + [
+                 "-f", "hls", "-hls_time", str(seg_secs), "-hls_playlist_type", "vod",
+                 "-hls_segment_filename", os.path.join(rdir, "seg_%05d.ts"),
+                 os.path.join(rdir, "index.m3u8")], timeout=budget or HELPER_TIMEOUT_SECS)
+
+
+def _package_dash(rdir, seg_secs, duration=None):
+    # Re-muxes the HLS segments, so DASH cuts match HLS and nothing is re-encoded
+    return _run([FFMPEG_PATH, "-hide_banner", "-v", "error", "-y",
+                 "-i", os.path.join(rdir, "index.m3u8"), "-map", "0", "-c", "copy",
+                 "-f", "dash", "-seg_duration", str(seg_secs), "-use_template", "1",
+                 "-init_seg_name", "init-$RepresentationID$.m4s",
+                 "-media_seg_name", "chunk-$RepresentationID$-$Number%05d$.m4s",
+                 os.path.join(rdir, "rendition.mpd")],
+                timeout=time_budget(duration, "-c copy") or HELPER_TIMEOUT_SECS)
+
+
+# ---------------- PLAYLISTS ----------------
+
+def _sorted_entries(manifest):
+    return sorted(manifest["renditions"].values(), key=lambda e: -e["bandwidth"])
+
+
+def write_master(out_dir, manifest):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for e in _sorted_entries(manifest):
+        inf = f"#EXT-X-STREAM-INF:BANDWIDTH={e['bandwidth']}"
+        if e.get("width") and e.get("height"):
+            inf += f",RESOLUTION={e['width']}x{e['height']}"
+        lines += [inf, f"{e['name']}/index.m3u8"]
+    _write_atomic(os.path.join(out_dir, "master.m3u8"), "\n".join(lines) + "\n")
+
+
+def write_mpd(out_dir, manifest):
+    """Combine the per-rendition MPDs into one, pointing into each rendition dir."""
+    import xml.etree.ElementTree as ET
+
+    ET.register_namespace("", MPD_NS)
+    q = lambda tag: f"{{{MPD_NS}}}{tag}"
+
+    base, sets = None, {}
+    for e in _sorted_entries(manifest):
+        if not e.get("dash"):
+            continue
+        root = ET.parse(os.path.join(out_dir, e["name"], "rendition.mpd")).getroot()
+        period = root.find(q("Period"))
+        found = []
+        for aset in period.findall(q("AdaptationSet")):
+            shared = aset.find(q("SegmentTemplate"))
+            reps = aset.findall(q("Representation"))
+            found.append((aset.get("contentType"), shared, reps))
+            if base is None:
+                # The first MPD is the skeleton; its sets get every rendition
+                sets[aset.get("contentType")] = aset
+                for node in reps + ([shared] if shared is not None else []):
+                    aset.remove(node)
+        if base is None:
+            base = root
+
+        for kind, shared, reps in found:
+            target = sets.get(kind)
+            if target is None:
+                continue
+            for rep in reps:
+                rid = rep.get("id")
+                tmpl = rep.find(q("SegmentTemplate"))
+                if tmpl is None and shared is not None:
+                    tmpl = ET.fromstring(ET.tostring(shared))
+                    rep.append(tmpl)
+                if tmpl is not None:
+                    for attr in ("initialization", "media"):
+                        if tmpl.get(attr):
+                            value = tmpl.get(attr).replace("$RepresentationID$", rid)
+                            tmpl.set(attr, f"{e['name']}/{value}")
+                rep.set("id", f"{e['name']}-{rid}")
+                target.append(rep)
+
+    if base is not None:
+        _write_atomic(os.path.join(out_dir, "manifest.mpd"),
+                      ET.tostring(base, encoding="unicode", xml_declaration=True))
+
+
+# ---------------- PACKAGE ----------------
+
+def package(paths, out_dir, dash=False, seg_secs=PACKAGE_SEGMENT_SECS, log=None):
+    """Package renditions into out_dir. Up-to-date renditions are left alone.
+    Returns {name: "copy" | "encode" | "kept" | "failed"}."""
+    log = log or (lambda m: None)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir, seg_secs)
+
+    # The reference cuts come from the package itself once it exists, so new
+    # renditions line up with the ones already written
+    if manifest["reference"] is None:
+        infos = {p: probe_media(p) for p in paths}
+        first = max(paths, key=lambda p: infos[p].get("bit_rate") or 0)
+        manifest["reference"] = reference_cuts(first, seg_secs)
+    reference = manifest["reference"]
+
+    tasks, result = [], {}
+    for path in paths:
+        name = rendition_name(path)
+        fp = file_fingerprint(path)
+        e = manifest["renditions"].get(name)
+        fresh = (e and e["fingerprint"] == fp
+                 and os.path.exists(os.path.join(out_dir, name, "index.m3u8")))
+        if fresh and (e.get("dash") or not dash):
+            result[name] = "kept"
+            continue
+        tasks.append((path, name, fp, e if fresh else None))
+
+    def work(task):
+        path, name, fp, existing = task
+        rdir = os.path.join(out_dir, name)
+        info = probe_media(path)
+
+        if existing:
+            mode = existing["mode"]
+        else:
+            codecs_ok = ((info.get("video") or {}).get("codec") in HLS_VIDEO
+                         and (info.get("audio") is None or info["audio"].get("codec") in HLS_AUDIO))
+            aligned = keyframes_aligned(path, reference, seg_secs)
+            mode = "copy" if codecs_ok and aligned else "encode"
+            log(f"📦 {name}: {'copy (keyframes aligned)' if mode == 'copy' else 're-encoding to align'}")
+            rc, err = _package_hls(path, info, rdir, mode, reference, seg_secs)
+            if rc != 0:
+                log(f"❌ {name}: packaging failed: {err}")
+                return name, None
+
+        entry = {
+            "name": name, "source": os.path.abspath(path), "fingerprint": fp, "mode": mode,
+            "bandwidth": info.get("bit_rate") or 0,
+            "width": (info.get("video") or {}).get("width"),
+            "height": (info.get("video") or {}).get("height"),
+            "dash": False,
+        }
+        if dash:
+            rc, err = _package_dash(rdir, seg_secs, info.get("duration"))
+            entry["dash"] = rc == 0
+            if rc != 0:
+                log(f"⚠ {name}: DASH failed: {err}")
+        return name, entry
+
+    workers = PACKAGE_WORKERS or min(len(tasks), os.cpu_count() or 2)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, entry in pool.map(work, tasks):
+            if entry is None:
+                result[name] = "failed"
+                continue
+            manifest["renditions"][name] = entry
+            result[name] = entry["mode"]
+
+    _write_atomic(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2))
+    write_master(out_dir, manifest)
+    if dash:
+        write_mpd(out_dir, manifest)
+    return result
+
+
+# ---------------- CLI ----------------
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Package renditions as HLS / DASH")
+    ap.add_argument("out_dir")
+    ap.add_argument("inputs", nargs="+")
+    ap.add_argument("--dash", action="store_true")
+    ap.add_argument("--seg", type=int, default=PACKAGE_SEGMENT_SECS)
+    opts = ap.parse_args()
+
+    result = package(opts.inputs, opts.out_dir, dash=opts.dash, seg_secs=opts.seg, log=print)
+    for name, what in sorted(result.items()):
+        print(f"{name}: {what}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# supervisor.py
+# Job supervision: stall / timeout watchdog for running FFmpeg processes,
+# classification of failures from exit code + stderr, and the retry policy
+#
+# One watchdog thread serves every running job. A job is killed when its
+# progress time stops changing for STALL_SECS, or when it runs longer than
+# its wall-clock budget: duration scaled by preset cost, resolution and the
+# number of passes (only known durations get one). Helper ffprobe / analysis
+# calls are bounded separately by HELPER_TIMEOUT_SECS.
+
+import re
+import threading
+import time
+
+from config import (STALL_SECS, TIMEOUT_FACTOR, TIMEOUT_MIN_SECS,
+                    FALLBACK_PRESET, MAX_RETRIES)
+from estimations import preset_cost
+
+# stderr patterns -> failure kind, first match wins
+ERROR_PATTERNS = [
+    ("disk_full", re.compile(r"No space left on device", re.I)),
+    ("missing_input", re.compile(r"No such file or directory|Permission denied", re.I)),
+    ("bad_args", re.compile(r"Unrecognized option|Unknown encoder|Option .* not found|"
+                            r"Error initializing output stream|Invalid argument", re.I)),
+    ("corrupt_input", re.compile(r"Invalid data found when processing input|corrupt|"
+                                 r"non-existing PPS|error while decoding|PES packet size mismatch|"
+                                 r"Packet mismatch|missing picture in access unit", re.I)),
+]
+
+# Kinds worth another attempt with the error-tolerant fallback preset
+RETRY_KINDS = ("corrupt_input", "stalled", "timeout", "crashed")
+
+# preset_cost() is relative to libx264 medium at 1080p
+REFERENCE_PIXELS = 1920 * 1080
+
+
+def time_budget(duration, args=None, passes=1, pixels=None):
+    """Wall-clock seconds a healthy encode may take, or None when unknown."""
+    if not duration:
+        return None
+    cost = max(1.0, preset_cost(args)) if args else 1.0
+    size = max(1.0, pixels / REFERENCE_PIXELS) if pixels else 1.0
+    return max(TIMEOUT_MIN_SECS, duration * TIMEOUT_FACTOR * cost * size * passes)
+
+
+class Watch:
+    """Supervision state of one job; progress() on every progress update."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.proc = None
+        self.started = self.last_advance = time.monotonic()
+        self.last_sec = None
+        self.reason = None
+
+    def attach(self, proc):
+        # Multi-pass jobs attach each process; the stall clock restarts
+        self.proc = proc
+        self.last_advance = time.monotonic()
+
+    def progress(self, sec):
+        if sec != self.last_sec:
+            self.last_sec = sec
+            self.last_advance = time.monotonic()
+
+    def check(self, now):
+        if self.reason or not self.proc or self.proc.poll() is not None:
+            return
+        if now - self.last_advance > STALL_SECS:
+            self.reason = "stalled"
+        elif self.budget and now - self.started > self.budget:
+            self.reason = "timeout"
+        else:
+            return
+        try:
+            self.proc.kill()
+        except OSError:
+            pass
+
+
+class Watchdog:
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.watches = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def watch(self, budget=None):
+        w = Watch(budget)
+        with self.lock:
+            self.watches.add(w)
+            if not self.thread:
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+        return w
+
+    def release(self, w):
+        with self.lock:
+            self.watches.discard(w)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self.lock:
+                watches = list(self.watches)
+            for w in watches:
+                w.check(now)
+
+
+watchdog = Watchdog()
+
+
+def classify(returncode, stderr_tail, reason=None):
+    """Failure kind for a finished process, or None on success.
+
+    reason is the watchdog's verdict, which wins over whatever the killed
+    process printed.
+    """
+    if reason:
+        return reason
+    if returncode == 0:
+        return None
+    text = "\n".join(stderr_tail)
+    for kind, pattern in ERROR_PATTERNS:
+        if pattern.search(text):
+            return kind
+    # Killed by a signal / exception exit rather than a reported error
+    if returncode < 0 or returncode > 255:
+        return "crashed"
+    return "failed"
+
+
+def fallback_args(args):
+    """Args for a retry, or None when there is nothing different to try."""
+    from presets import get_presets
+
+    preset = get_presets().get(FALLBACK_PRESET)
+    if not preset or preset["args"] == args:
+        return None
+    return preset["args"]
+
+
+def should_retry(kind, attempt):
+    return kind in RETRY_KINDS and attempt < MAX_RETRIES
@@ -0,0 +1,60 @@
+# conftest.py
+# Shared fixtures: repo modules importable, each test in its own working folder
+# (preset / history / cache files land there), stub FFmpeg and ffprobe
+
+import os
+import stat
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Progress lines in FFmpeg's stderr format, up to STUB_SECS of media
+STUB_FFMPEG = """#!/bin/sh
+for last; do :; done
+secs=${STUB_SECS:-2}
+i=0
+while [ "$i" -lt "$secs" ]; do
+    i=$((i + 1))
+    echo "frame=$((i * 30)) fps=900 q=23.0 size=$((i * 256))kB time=00:00:$(printf %02d $i).00 bitrate=1000.0kbits/s speed=30.0x" >&2
+done
+: > "$last"
+"""
+
+STUB_FFPROBE = """#!/bin/sh
+cat <<JSON
+{"format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "${STUB_DURATION:-2.0}", "bit_rate": "1000000"},
+ "streams": [{"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+              "pix_fmt": "yuv420p", "avg_frame_rate": "30/1", "bit_rate": "900000"},
+             {"codec_type": "audio", "codec_name": "aac", "bit_rate": "128000"}]}
+JSON
+"""
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _script(path, text):
+    path.write_text(text)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.fixture
+def stub_ffmpeg(tmp_path, monkeypatch):
+    """Point the runner and prober at shell stubs. Returns the tools folder."""
+    if os.name == "nt":
+        pytest.skip("stub tools are POSIX shell scripts")
+    import ffmpeg_runner
+    import file_manager
+
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    monkeypatch.setattr(ffmpeg_runner, "FFMPEG_PATH", _script(tools / "ffmpeg", STUB_FFMPEG))
+    monkeypatch.setattr(file_manager, "FFPROBE_PATH", _script(tools / "ffprobe", STUB_FFPROBE))
+    return tools
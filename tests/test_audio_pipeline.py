@@ -0,0 +1,59 @@
+# test_audio_pipeline.py
+# Audio stream selection and the loudnorm measurement cache
+
+import json
+
+import pytest
+
+import audio_pipeline
+from audio_pipeline import prepare_audio_args, measure_loudness
+from config import LOUDNORM_CACHE_FILE
+
+# Prints loudnorm's first-pass JSON and counts its runs
+STUB_LOUDNORM = """#!/bin/sh
+echo run >> "$STUB_COUNT"
+cat >&2 <<JSON
+[Parsed_loudnorm_0 @ 0x1]
+{
+    "input_i" : "-27.61",
+    "input_tp" : "-4.47",
+    "input_lra" : "18.06",
+    "input_thresh" : "-39.20",
+    "output_i" : "-24.00"
+}
+JSON
+"""
+
+
+@pytest.fixture
+def loudnorm_ffmpeg(workdir, monkeypatch):
+    stub = workdir / "ffmpeg"
+    stub.write_text(STUB_LOUDNORM)
+    stub.chmod(0o755)
+    monkeypatch.setattr(audio_pipeline, "FFMPEG_PATH", str(stub))
+    monkeypatch.setattr(audio_pipeline, "_cache", None)
+    monkeypatch.setenv("STUB_COUNT", str(workdir / "runs"))
+    return workdir / "runs"
+
+
+def test_maps_first_audio_track_only():
+    assert prepare_audio_args("a.mp4", "-vn -c:a aac").startswith("-map 0:a:0? ")
+    assert prepare_audio_args("a.mp4", "-c:v copy -c:a aac").startswith("-map 0:v? -map 0:a:0? ")
+    assert prepare_audio_args("a.mp4", "-map 0:a:1 -vn -c:a aac") == "-map 0:a:1 -vn -c:a aac"
+
+
+def test_measurement_cached_once(loudnorm_ffmpeg, workdir):
+    src = workdir / "a.wav"
+    src.write_bytes(b"\1" * 64)
+    args = prepare_audio_args(str(src), "-vn -af loudnorm=I=-16 -c:a aac")
+    assert "measured_I=-27.61" in args and "I=-16" in args
+    assert measure_loudness(str(src))["input_tp"] == "-4.47"
+    assert loudnorm_ffmpeg.read_text().count("run") == 1
+
+    data = json.loads((workdir / LOUDNORM_CACHE_FILE).read_text())
+    assert list(data.values()) == [measure_loudness(str(src))]
+
+
+def test_missing_file_not_cached(loudnorm_ffmpeg, workdir):
+    measure_loudness(str(workdir / "gone.wav"))
+    assert not (workdir / LOUDNORM_CACHE_FILE).exists()
@@ -0,0 +1,105 @@
+# test_batch_engine.py
+# Engine end-to-end with the stub FFmpeg: results, and jobs that raise
+
+import subprocess
+import threading
+from types import SimpleNamespace
+
+import batch_engine
+import supervisor
+from batch_engine import BatchEngine
+from job_queue import Job
+
+
+def run_batch(jobs, **kw):
+    done = threading.Event()
+    logs = []
+    engine = BatchEngine(workers=2, smart_copy=False, on_log=logs.append,
+                         on_finished=done.set, **kw)
+    for job in jobs:
+        engine.submit(job)
+    engine.start()
+    engine.finish()
+    assert done.wait(timeout=30), "finished never fired"
+    return engine, logs
+
+
+def make_jobs(workdir, n, args="-c:v libx264 -crf 23 -c:a aac"):
+    jobs = []
+    for i in range(n):
+        src = workdir / f"in_{i}.mp4"
+        src.write_bytes(b"\0" * 64)
+        jobs.append(Job(str(src), str(workdir / f"in_{i}_converted.mp4"), args))
+    return jobs
+
+
+def test_batch_runs(stub_ffmpeg, workdir):
+    engine, _ = run_batch(make_jobs(workdir, 4))
+    assert engine.counts == {"done": 4}
+
+
+def test_raising_job_still_ends_batch(stub_ffmpeg, workdir, monkeypatch):
+    def broken(*a, **kw):
+        raise FileNotFoundError("ffmpeg")
+
+    monkeypatch.setattr(batch_engine, "select_crf", broken)
+    jobs = make_jobs(workdir, 3)
+    jobs[0].auto_crf = True
+    # Unbalanced quote: shlex raises ValueError while the job is prepared
+    jobs[1].args = '-vf "scale=640:360 -c:v libx264'
+
+    engine, logs = run_batch(jobs)
+    assert engine.counts == {"failed": 2, "done": 1}
+    assert {j.error for j in jobs[:2]} == {"exception"}
+    assert any("FileNotFoundError" in m for m in logs)
+    assert not engine._threads
+
+
+def use_plugins(monkeypatch, jobs, **funcs):
+    """Every job selects a fake executor / post_step plugin."""
+    monkeypatch.setattr(batch_engine, "load_plugin",
+                        lambda name, kind: SimpleNamespace(**funcs))
+    for job in jobs:
+        job.plugins = {kind: "fake" for kind in ("executor", "post_step")
+                       if ("run_job" if kind == "executor" else "run") in funcs}
+
+
+def test_raising_plugins_are_contained(stub_ffmpeg, workdir, monkeypatch):
+    def run_job(job, args, on_progress, on_start):
+        if job.path.endswith("in_0.mp4"):
+            raise RuntimeError("boom")
+        open(job.outfile, "wb").close()
+        return 0
+
+    def run(job, log):
+        raise RuntimeError("post boom")
+
+    jobs = make_jobs(workdir, 2)
+    use_plugins(monkeypatch, jobs, run_job=run_job, run=run)
+    engine, logs = run_batch(jobs)
+    assert engine.counts == {"failed": 1, "done": 1}
+    assert jobs[0].error == "failed"
+    assert any("executor plugin raised RuntimeError" in m for m in logs)
+    assert any("post-step plugin failed" in m for m in logs)
+
+
+def test_stalled_executor_is_killed(stub_ffmpeg, workdir, monkeypatch):
+    monkeypatch.setattr(supervisor, "STALL_SECS", 0.5)
+
+    def run_job(job, args, on_progress, on_start):
+        proc = subprocess.Popen(["sleep", "30"])
+        on_start(proc)
+        return proc.wait()
+
+    jobs = make_jobs(workdir, 1)
+    use_plugins(monkeypatch, jobs, run_job=run_job)
+    engine, _ = run_batch(jobs)
+    assert jobs[0].status == "failed" and jobs[0].error == "stalled"
+
+
+def test_target_bitrate_runs_two_pass(stub_ffmpeg, workdir):
+    jobs = make_jobs(workdir, 1)
+    jobs[0].target_kbps = 800
+    engine, logs = run_batch(jobs)
+    assert engine.counts == {"done": 1}
+    assert any("two-pass to 800 kbps" in m for m in logs)
@@ -0,0 +1,35 @@
+# test_bounds.py
+# Long-session state stays bounded: ingest memory and two-pass folder locks
+
+import twopass
+import watch_ingest
+from watch_ingest import IngestTracker
+
+
+def test_ingest_memory_is_capped(workdir, monkeypatch):
+    monkeypatch.setattr(watch_ingest, "INGEST_MEMORY_MAX", 5)
+    tracker = IngestTracker(stable_secs=0)
+    tracker.mark_seen([f"old_{i}.mp4" for i in range(20)])
+    for i in range(20):
+        tracker.add_output(f"out_{i}.mp4")
+
+    for i in range(20):
+        (workdir / f"new_{i}.mp4").write_bytes(bytes([i]) * 16)
+        tracker.note(str(workdir / f"new_{i}.mp4"), now=0)
+    tracker.poll(now=1)
+    assert len(tracker.poll(now=2)) == 20
+
+    assert len(tracker.seen_paths) == 5
+    assert len(tracker.seen_fps) == 5
+    assert len(tracker.outputs) == 5
+    # The most recent entries are the ones remembered
+    assert str(workdir / "new_19.mp4") in tracker.seen_paths
+
+
+def test_twopass_dir_locks_released(workdir):
+    with twopass._dir_lock("a") as got:
+        assert got
+        with twopass._dir_lock("a", blocking=False) as again:
+            assert not again
+        assert list(twopass._dir_locks) == ["a"]
+    assert twopass._dir_locks == {}
@@ -0,0 +1,57 @@
+# test_dry_run.py
+# Dry-run plans: commands as the engine will run them, and job-file round trips
+
+from dry_run import plan_batch, save_plan, load_plan, plan_engine
+
+
+def source(workdir, name="a.mp4"):
+    path = workdir / name
+    path.write_bytes(b"\0" * 64)
+    return str(path)
+
+
+def test_two_pass_plan_lists_both_passes(stub_ffmpeg, workdir):
+    plan = plan_batch([source(workdir)], "-c:v libx264 -preset medium -crf 23 -c:a aac -b:a 128k",
+                      str(workdir / "out"), target_mb=1)
+    job = plan["jobs"][0]
+    assert job["action"] == "two-pass"
+    first, second = job["passes"]
+    assert first[first.index("-pass") + 1] == "1" and first[-1] == "-"
+    assert second[second.index("-pass") + 1] == "2" and "-crf" not in second
+    assert job["argv"] == second
+
+
+def test_audio_plan_shows_stream_selection_and_runtime_parts(stub_ffmpeg, workdir):
+    plan = plan_batch([source(workdir, "a.wav")], "-vn -af loudnorm=I=-16 -c:a aac",
+                      str(workdir / "out"), smart_copy=False)
+    job = plan["jobs"][0]
+    assert job["argv"][job["argv"].index("-map") + 1] == "0:a:0?"
+    assert job["runtime"] == ["loudnorm measured per file"]
+
+
+def test_job_file_keeps_options(stub_ffmpeg, workdir):
+    path = source(workdir)
+    plan = plan_batch([path], "-c:v libx264 -crf 23", str(workdir / "out"), smart_copy=False,
+                      auto_crf=True, plugins={"post_step": "notify"}, order={path: (2, True)})
+    assert plan["jobs"][0]["runtime"] == ["-crf picked per file"]
+    save_plan(plan, str(workdir / "plan.json"))
+
+    engine = plan_engine(load_plan(str(workdir / "plan.json")))
+    job = engine.queue.pop(timeout=0)
+    assert (job.auto_crf, job.plugins, job.priority, job.pinned) == \
+        (True, {"post_step": "notify"}, 2, True)
+    assert job.duration == 2.0
+
+
+def test_target_bitrate_feeds_both_passes(stub_ffmpeg, workdir):
+    plan = plan_batch([source(workdir)], "-c:v libx264 -preset medium -crf 23 -c:a aac -b:a 128k",
+                      str(workdir / "out"), target_kbps=1500)
+    job = plan["jobs"][0]
+    assert job["action"] == "two-pass"
+    for argv in job["passes"]:
+        assert argv[argv.index("-b:v") + 1] == "1500k"
+    # 2 s of 1500k video + 128k audio
+    assert job["pred_bytes"] == int(1628 * 1000 / 8 * 2.0)
+
+    job = plan_engine(plan).queue.pop(timeout=0)
+    assert (job.target_kbps, job.target_mb) == (1500, None)
@@ -0,0 +1,86 @@
+# test_event_bus.py
+# Event bus behaviour and a throughput benchmark with hundreds of jobs publishing at once
+
+import threading
+import time
+
+from event_bus import EventBus
+from job_queue import Job
+
+JOBS = 400
+UPDATES_PER_JOB = 250
+LOGS_PER_JOB = 25
+
+# Conservative floor so slow CI machines pass; typical runs are far above it
+MIN_EVENTS_PER_SEC = 20000
+
+
+def test_progress_is_coalesced_per_job():
+    bus = EventBus()
+    sub = bus.subscribe()
+    job = Job("a.mp4", "a_out.mp4", "-c:v copy")
+    for sec in range(100):
+        bus.publish("progress", job, sec=sec)
+    events = sub.drain()
+    assert [(e.kind, e.data["sec"]) for e in events] == [("progress", 99)]
+
+
+def test_logs_are_bounded_and_lifecycle_kept():
+    bus = EventBus()
+    sub = bus.subscribe(maxsize=10)
+    job = Job("a.mp4", "a_out.mp4", "-c:v copy")
+    for i in range(50):
+        bus.publish("log", msg=str(i))
+    bus.publish("job_done", job)
+    events = sub.drain()
+    assert [e.kind for e in events][-2:] == ["job_done", "log"]
+    assert events[-1].data["msg"] == "… 40 log lines dropped"
+
+
+def test_throughput_hundreds_of_jobs():
+    bus = EventBus()
+    jobs = [Job(f"clip_{i}.mp4", f"clip_{i}_out.mp4", "-c:v libx264") for i in range(JOBS)]
+    got = {"events": 0, "ticks": 0, "max_tick": 0, "done": 0}
+
+    def view(events):
+        # A Tk-like consumer on the GUI's drain interval
+        got["events"] += len(events)
+        got["ticks"] += 1
+        got["max_tick"] = max(got["max_tick"], len(events))
+        got["done"] += sum(1 for e in events if e.kind == "job_done")
+
+    sub = bus.attach(view, interval=0.1)
+
+    def worker(batch):
+        for job in batch:
+            bus.publish("job_start", job)
+        for sec in range(UPDATES_PER_JOB):
+            for job in batch:
+                bus.publish("progress", job, sec=sec, speed=1.0)
+                if sec % (UPDATES_PER_JOB // LOGS_PER_JOB) == 0:
+                    bus.publish("log", msg=f"{job.path} {sec}")
+        for job in batch:
+            bus.publish("job_done", job)
+
+    # 16 publisher threads, each driving 25 concurrently running jobs
+    threads = [threading.Thread(target=worker, args=(jobs[i::16],)) for i in range(16)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    sub.close()
+    sub.thread.join()
+
+    published = JOBS * (2 + UPDATES_PER_JOB + LOGS_PER_JOB)
+    rate = published / elapsed
+    print(f"\n{published} events from {JOBS} jobs in {elapsed:.2f}s: {rate:,.0f} events/s, "
+          f"{got['events']} delivered in {got['ticks']} drains (largest {got['max_tick']})")
+
+    assert got["done"] == JOBS
+    assert rate > MIN_EVENTS_PER_SEC
+    # Coalescing: a drain never carries more than one progress event per job
+    # on top of the bounded queue
+    assert got["max_tick"] <= JOBS + 10001
+    assert got["events"] < published
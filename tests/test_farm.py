@@ -0,0 +1,70 @@
+# test_farm.py
+# Coordinator + worker on loopback with the stub FFmpeg, token checks and path mapping
+
+import os
+import threading
+import urllib.error
+
+import pytest
+
+import farm
+from farm import Coordinator, FarmWorker, map_path, parse_path_map, _post
+from job_queue import Job
+
+
+def start_coordinator(**kw):
+    done = threading.Event()
+    results = []
+    coord = Coordinator(host="127.0.0.1", port=0, on_finished=done.set,
+                        on_job_done=results.append, **kw)
+    return coord, done, results
+
+
+def url(coord):
+    host, port = coord.server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def test_farm_runs_jobs(stub_ffmpeg, workdir, monkeypatch):
+    monkeypatch.setattr(farm, "FARM_HEARTBEAT_SECS", 0.2)
+    coord, done, results = start_coordinator(token="s3cret")
+    for i in range(4):
+        src = workdir / f"in_{i}.mp4"
+        src.write_bytes(b"\0" * 64)
+        coord.submit(Job(str(src), str(workdir / "out" / f"in_{i}.mp4"), "-c:v libx264 -crf 23"))
+    coord.start()
+
+    worker = FarmWorker(url(coord), "w1", slots=2, token="s3cret",
+                        ffmpeg=str(stub_ffmpeg / "ffmpeg"))
+    threading.Thread(target=worker.run, daemon=True).start()
+    try:
+        assert done.wait(timeout=30)
+    finally:
+        worker.running = False
+        coord.stop()
+
+    assert sorted(j.status for j in results) == ["done"] * 4
+    assert all((workdir / "out" / f"in_{i}.mp4").exists() for i in range(4))
+
+
+def test_wrong_token_rejected():
+    coord, _, _ = start_coordinator(token="s3cret")
+    coord.start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            _post(url(coord), "/lease", {"worker": "w1"}, "nope")
+        assert e.value.code == 403
+        assert _post(url(coord), "/lease", {"worker": "w1"}, "s3cret") == {"job": None}
+    finally:
+        coord.stop()
+
+
+def test_token_required_off_loopback():
+    with pytest.raises(ValueError):
+        Coordinator(host="0.0.0.0", port=0, token="")
+
+
+def test_path_map():
+    mapping = parse_path_map(["D:\\Media=/mnt/media"])
+    assert map_path("d:\\media\\show\\a.mp4", mapping) == os.path.join("/mnt/media", "show", "a.mp4")
+    assert map_path("E:/other/a.mp4", mapping) == "E:/other/a.mp4"
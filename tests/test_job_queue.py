@@ -0,0 +1,55 @@
+# test_job_queue.py
+# Heap ordering with priority / pin / duration / policy changes applied to waiting jobs
+
+from job_queue import Job, JobQueue
+
+
+def fill(policy, durations):
+    q = JobQueue(policy)
+    for i, d in enumerate(durations):
+        job = Job(f"f{i}", f"o{i}", "-c:v libx264 -crf 23")
+        job.duration = d
+        q.push(job)
+    return q
+
+
+def drain(q):
+    out = []
+    while len(q):
+        out.append(q.pop(timeout=0).id)
+    return out
+
+
+def test_policies():
+    assert drain(fill("fifo", [30, 10, 20])) == ["f0", "f1", "f2"]
+    assert drain(fill("sjf", [30, 10, 20])) == ["f1", "f2", "f0"]
+    assert drain(fill("ljf", [30, 10, 20])) == ["f0", "f2", "f1"]
+
+
+def test_changes_apply_to_waiting_jobs():
+    q = fill("fifo", [0, 0, 0, 0])
+    q.set_priority("f2", 1)
+    q.set_pinned("f3", True)
+    q.remove("f0")
+    assert drain(q) == ["f3", "f2", "f1"]
+
+    q = fill("sjf", [0, 0, 0])
+    q.set_duration("f0", 50)
+    q.set_duration("f1", 5)
+    q.set_duration("f2", 20)
+    assert drain(q) == ["f1", "f2", "f0"]
+
+    q = fill("fifo", [30, 10, 20])
+    q.set_policy("ljf")
+    assert q.pop(timeout=0).id == "f0"
+    q.set_policy("sjf")
+    assert drain(q) == ["f1", "f2"]
+
+
+def test_stale_entries_stay_bounded():
+    q = fill("fifo", [0] * 10)
+    for n in range(1000):
+        q.set_priority(f"f{n % 10}", n)
+    assert len(q._heap) <= 2 * len(q) + 64
+    assert drain(q)[0] == "f9"
+    assert q.pop(timeout=0) is None
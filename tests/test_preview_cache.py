@@ -0,0 +1,13 @@
+# test_preview_cache.py
+# Helper FFmpeg calls for thumbnails/previews are bounded and never raise
+
+import preview_cache
+
+
+def test_hung_decode_times_out(monkeypatch):
+    monkeypatch.setattr(preview_cache, "HELPER_TIMEOUT_SECS", 0.2)
+    assert preview_cache._run(["sleep", "5"]) is False
+
+
+def test_missing_ffmpeg_is_a_failure(workdir):
+    assert preview_cache._run([str(workdir / "no-ffmpeg"), "-version"]) is False
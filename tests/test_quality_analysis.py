@@ -0,0 +1,37 @@
+# test_quality_analysis.py
+# Auto CRF with a missing FFmpeg, and the in-memory quality cache
+
+import json
+
+import pytest
+
+import quality_analysis
+from config import QUALITY_CACHE_FILE
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(quality_analysis, "_cache", None)
+    monkeypatch.setattr(quality_analysis, "_vmaf", None)
+
+
+def test_missing_ffmpeg_keeps_preset_value(workdir, monkeypatch):
+    monkeypatch.setattr(quality_analysis, "FFMPEG_PATH", str(workdir / "no-ffmpeg"))
+    src = workdir / "a.mp4"
+    src.write_bytes(b"\0" * 64)
+    logs = []
+    assert quality_analysis.select_crf(str(src), "-c:v libx264 -crf 23", logs.append) is None
+    assert any("analysis failed" in m for m in logs)
+    # Failed analyses are not cached
+    assert not (workdir / QUALITY_CACHE_FILE).exists()
+
+
+def test_cache_loaded_once_and_written_atomically(workdir):
+    (workdir / QUALITY_CACHE_FILE).write_text(json.dumps({"old": {"scores": {}}}))
+    assert "old" in quality_analysis._load_cache()
+    quality_analysis._save_entry("new", {"scores": {"23": 0.99}})
+    assert quality_analysis._load_cache() is quality_analysis._load_cache()
+
+    data = json.loads((workdir / QUALITY_CACHE_FILE).read_text())
+    assert set(data) == {"old", "new"}
+    assert not (workdir / (QUALITY_CACHE_FILE + ".tmp")).exists()
@@ -0,0 +1,71 @@
+# test_routing.py
+# Smart-copy routing of the default presets against synthetic probe data
+
+import pytest
+
+from ffmpeg_args import split_args
+from presets import DEFAULT_PRESETS
+from routing import route_job, KNOWN_OPTS, BITRATE_SLACK
+
+MP4 = "mov,mp4,m4a,3gp,3g2,mj2"
+
+
+def media(codec="h264", width=1920, height=1080, video_kbps=2000, audio="aac",
+          audio_kbps=128, fmt=MP4):
+    info = {"format": fmt, "bit_rate": (video_kbps + audio_kbps) * 1000,
+            "video": {"codec": codec, "width": width, "height": height, "fps": 30.0,
+                      "bit_rate": video_kbps * 1000}}
+    if audio:
+        info["audio"] = {"codec": audio, "bit_rate": audio_kbps * 1000}
+    return info
+
+
+def route(preset, info, infile="in.mp4", outfile="out.mp4"):
+    return route_job(info, DEFAULT_PRESETS[preset]["args"], infile, outfile)
+
+
+def test_stream_altering_presets_always_encode():
+    altering = {name for name, p in DEFAULT_PRESETS.items()
+                if any(o not in KNOWN_OPTS for o, _ in split_args(p["args"]))}
+    assert {"Direct Copy + Error Correction", "Fix A/V Sync",
+            "Normalize Audio + Copy Video"} <= altering
+    for name in altering:
+        assert route(name, media()) == \
+            ("encode", DEFAULT_PRESETS[name]["args"], "preset has stream-altering options")
+
+
+def test_cq_ceiling():
+    # libx264 -crf 23 at 1080p30: ceiling is ~2.5 Mbps
+    assert route("H.264 CPU Standard", media(video_kbps=2000))[0] == "skip"
+    action, args, _ = route("H.264 CPU Standard", media(video_kbps=8000))
+    assert action == "copy" and "-c:a copy" in args and "-c:v libx264" in args
+    # A higher CRF lowers the ceiling
+    small = media(width=640, height=360, video_kbps=90, audio_kbps=64)
+    assert route("Ultra Low Bandwidth", small)[0] == "skip"
+    small["video"]["bit_rate"] = 200_000
+    assert route("Ultra Low Bandwidth", small)[0] == "copy"
+    # QSV -global_quality is judged the same way, against the source codec
+    assert route("HEVC QSV Small", media(codec="hevc", video_kbps=1200))[0] == "skip"
+    assert route("HEVC QSV Small", media(codec="h264", video_kbps=1200))[0] == "copy"
+
+
+def test_bitrate_slack():
+    limit = int(900 * BITRATE_SLACK)
+    inside = media(width=854, height=480, video_kbps=limit, audio_kbps=96)
+    assert route("Mobile Friendly 480p", inside)[0] == "skip"
+    over = media(width=854, height=480, video_kbps=limit + 10, audio_kbps=96)
+    action, args, _ = route("Mobile Friendly 480p", over)
+    assert action == "copy" and "-c:v h264_qsv" in args and "-b:a" not in args
+    # Wrong size never matches, whatever the bitrate
+    assert route("Mobile Friendly 480p", media(video_kbps=500, audio_kbps=96))[0] == "copy"
+
+
+@pytest.mark.parametrize("infile, outfile, fmt, action", [
+    ("in.mp4", "out.mp4", MP4, "skip"),
+    ("in.ts", "out.ts", "mpegts", "skip"),
+    ("in.mkv", "out.mp4", "matroska,webm", "copy"),     # extension differs
+    ("in.mp4", "out.mp4", "matroska,webm", "copy"),     # mislabelled file
+    ("in.mov", "out.mov", MP4, "skip"),                 # ffprobe's shared mov/mp4 name
+])
+def test_container_match_by_extension(infile, outfile, fmt, action):
+    assert route("H.264 CPU Standard", media(fmt=fmt), infile, outfile)[0] == action
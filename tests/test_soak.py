@@ -0,0 +1,104 @@
+# test_soak.py
+# Memory-bounded operation: a long batch through the engine with a stub FFmpeg
+# must keep RSS flat and every retained structure within its cap.
+#
+# The default run is scaled down to keep the suite quick. The full soak is
+# 50k files whose durations add up to 24 hours of media:
+#   SOAK_FILES=50000 python -m pytest tests/test_soak.py -s
+
+import os
+import threading
+
+import pytest
+
+import batch_engine
+import file_manager
+import watch_ingest
+from batch_engine import BatchEngine
+from event_bus import EventBus
+from job_queue import Job
+from watch_ingest import IngestTracker
+
+SOAK_FILES = int(os.environ.get("SOAK_FILES", 2000))
+SOAK_MEDIA_SECS = 24 * 3600
+SAMPLES = 10
+
+# Caps are lowered so the scaled-down run still hits every bound
+CAP = 200
+
+# Growth allowed between the first and the last sample once warmed up
+RSS_SLACK_KB = 8 * 1024
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+@pytest.mark.skipif(rss_kb() is None, reason="needs /proc/self/status")
+def test_soak_flat_rss(stub_ffmpeg, workdir, monkeypatch):
+    monkeypatch.setattr(batch_engine, "MAX_JOB_RECORDS", CAP)
+    monkeypatch.setattr(file_manager, "META_CACHE_MAX", CAP)
+    monkeypatch.setattr(watch_ingest, "INGEST_MEMORY_MAX", CAP)
+    monkeypatch.setenv("STUB_DURATION", str(SOAK_MEDIA_SECS / SOAK_FILES))
+
+    src = workdir / "src"
+    out = workdir / "out"
+    src.mkdir()
+    out.mkdir()
+
+    bus = EventBus()
+    seen = {"events": 0}
+
+    def gui(events):
+        # Stands in for the Tk drain tick
+        seen["events"] += len(events)
+
+    view = bus.attach(gui, interval=0.1)
+    tracker = IngestTracker()
+    samples = []
+    done = threading.Event()
+    finished = {"n": 0}
+    lock = threading.Lock()
+
+    def on_job_done(job):
+        tracker.add_output(job.outfile)
+        with lock:
+            finished["n"] += 1
+            n = finished["n"]
+        if n % (SOAK_FILES // SAMPLES) == 0:
+            samples.append(rss_kb())
+
+    engine = BatchEngine(workers=8, smart_copy=False, bus=bus,
+                         on_job_done=on_job_done, on_finished=done.set)
+    engine.start()
+    for i in range(SOAK_FILES):
+        path = src / f"clip_{i:05d}.mp4"
+        path.write_bytes(b"\0" * 64)
+        engine.submit(Job(str(path), str(out / f"clip_{i:05d}_converted.mp4"),
+                          "-c:v libx264 -preset veryfast -crf 23 -c:a aac"))
+    engine.finish()
+    assert done.wait(timeout=SOAK_FILES)
+    view.close()
+    view.thread.join()
+
+    assert engine.counts == {"done": SOAK_FILES}
+    assert seen["events"] >= 2 * SOAK_FILES
+
+    # Retained state stays at its caps, however long the batch
+    assert len(engine.finished) == CAP
+    assert not engine.running_processes()
+    assert len(engine.active_processes) <= engine.workers + engine.audio_workers
+    assert len(file_manager._meta_cache) <= CAP
+    assert len(tracker.outputs) <= CAP
+
+    # Flat RSS: the first sample is warm-up, the rest may only wobble
+    print(f"\nRSS samples (kB) over {SOAK_FILES} jobs: {samples}")
+    steady = samples[1:]
+    assert max(steady) - steady[0] < RSS_SLACK_KB
@@ -0,0 +1,47 @@
+# test_startup.py
+# Startup-time benchmark: importing the GUI module and loading presets must stay
+# light; heavy modules are only imported on first use
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+# Generous for cold caches / slow CI; a warm import takes well under 100 ms
+MAX_STARTUP_SECS = 2.0
+
+LAZY_MODULES = ["watchdog", "ui_preset_editor", "estimations", "file_manager",
+                "batch_engine", "dry_run", "quality_analysis", "farm"]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import ui_main
+t1 = time.perf_counter()
+from presets import get_presets
+get_presets()
+t2 = time.perf_counter()
+get_presets()
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "presets": t2 - t1, "presets_cached": t3 - t2,
+                  "loaded": sorted(m for m in %r if m in sys.modules)}))
+""" % (LAZY_MODULES,)
+
+
+def run_probe(cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.check_output([sys.executable, "-c", PROBE], cwd=cwd, env=env, timeout=60)
+    return json.loads(out.decode().splitlines()[-1])
+
+
+def test_startup_time(workdir):
+    first = run_probe(workdir)          # writes the preset file in the background
+    second = run_probe(workdir)
+    print(f"\ncold: {first}\nwarm: {second}")
+
+    for r in (first, second):
+        assert r["loaded"] == []
+        assert r["import"] + r["presets"] < MAX_STARTUP_SECS
+        assert r["presets_cached"] <= r["presets"] + 0.01
@@ -0,0 +1,35 @@
+# test_stream_packaging.py
+# Copy-vs-encode decision when keyframes can't be read, and bounded helper runs
+
+import stream_packaging
+from stream_packaging import keyframes_aligned, reference_cuts, segment_cuts
+
+
+def fake_media(monkeypatch, keyframes, duration):
+    monkeypatch.setattr(stream_packaging, "keyframe_times", lambda p: keyframes[p])
+    monkeypatch.setattr(stream_packaging, "probe_media", lambda p: {"duration": duration[p]})
+
+
+def test_unreadable_keyframes_are_not_aligned(monkeypatch):
+    fake_media(monkeypatch, {"long.mp4": [], "short.mp4": []},
+               {"long.mp4": 60.0, "short.mp4": 4.0})
+    # A failed probe gives no cuts, which would otherwise "match" an empty reference
+    assert not keyframes_aligned("long.mp4", [], 6)
+    # Media shorter than one segment really has no cuts
+    assert keyframes_aligned("short.mp4", [], 6)
+
+
+def test_reference_falls_back_to_fixed_cuts(monkeypatch):
+    keys = [float(t) for t in range(0, 30, 2)]
+    fake_media(monkeypatch, {"bad.mp4": [], "good.mp4": keys},
+               {"bad.mp4": 20.0, "good.mp4": 30.0})
+    assert reference_cuts("bad.mp4", 6) == [6.0, 12.0, 18.0]
+    assert reference_cuts("good.mp4", 6) == segment_cuts(keys, 6) == [6.0, 12.0, 18.0, 24.0]
+    assert keyframes_aligned("good.mp4", [6.0, 12.0, 18.0, 24.0], 6)
+
+
+def test_run_times_out():
+    rc, err = stream_packaging._run(["sleep", "5"], timeout=0.2)
+    assert rc != 0 and "timed out" in err
+    rc, err = stream_packaging._run(["/nonexistent/ffmpeg"])
+    assert rc != 0
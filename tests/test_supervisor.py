@@ -0,0 +1,58 @@
+# test_supervisor.py
+# Failure classification, wall-clock budgets and the retry policy
+
+import pytest
+
+import supervisor
+from config import TIMEOUT_FACTOR, TIMEOUT_MIN_SECS, MAX_RETRIES
+from supervisor import classify, time_budget, should_retry
+
+
+def test_classify_success_and_watchdog_verdict():
+    assert classify(0, []) is None
+    # The watchdog's reason wins over whatever the killed process printed
+    assert classify(-9, ["Invalid data found when processing input"], "stalled") == "stalled"
+
+
+def test_classify_stderr_patterns():
+    assert classify(1, ["foo", "No space left on device"]) == "disk_full"
+    assert classify(1, ["a.mp4: No such file or directory"]) == "missing_input"
+    assert classify(1, ["Unknown encoder 'libfoo'"]) == "bad_args"
+    assert classify(1, ["[h264 @ 0x1] non-existing PPS 0 referenced"]) == "corrupt_input"
+    # First match wins
+    assert classify(1, ["corrupt", "No space left on device"]) == "disk_full"
+
+
+def test_classify_exit_codes():
+    assert classify(1, ["something else"]) == "failed"
+    assert classify(-11, []) == "crashed"
+    assert classify(3221225477, []) == "crashed"     # Windows access violation
+
+
+def test_time_budget():
+    assert time_budget(0) is None
+    assert time_budget(None, "-c:v libx264") is None
+    assert time_budget(1, "-c:v libx264") == TIMEOUT_MIN_SECS
+
+    base = time_budget(3600, "-c:v libx264 -preset medium")
+    assert base == 3600 * TIMEOUT_FACTOR
+    assert time_budget(3600, "-c:v libx264 -preset medium", passes=2) == 2 * base
+    assert time_budget(3600, "-c:v libx265 -preset slow") == pytest.approx(base * 3.0 * 1.6)
+    assert time_budget(3600, "-c:v libx264", pixels=3840 * 2160) == base * 4
+    # Cheap presets and small frames never shrink the budget below the baseline
+    assert time_budget(3600, "-c:v copy", pixels=640 * 360) == base
+
+
+def test_should_retry():
+    assert should_retry("corrupt_input", 0)
+    assert should_retry("stalled", 0)
+    assert not should_retry("corrupt_input", MAX_RETRIES)
+    assert not should_retry("disk_full", 0)
+    assert not should_retry("bad_args", 0)
+    assert not should_retry(None, 0)
+
+
+def test_fallback_args_differs_from_input(workdir):
+    retry = supervisor.fallback_args("-c:v libx264 -crf 23")
+    assert retry and retry != "-c:v libx264 -crf 23"
+    assert supervisor.fallback_args(retry) is None
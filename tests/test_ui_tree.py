@@ -0,0 +1,81 @@
+# test_ui_tree.py
+# RowBinder batching against a fake Treeview (no display needed)
+
+import itertools
+
+from ui_tree import RowBinder
+
+COLUMNS = ("use", "in", "est_size", "status")
+
+
+class FakeTree:
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+        self.writes = 0
+        self._ids = itertools.count()
+
+    def __getitem__(self, key):
+        return COLUMNS
+
+    def after(self, ms, func):
+        pass
+
+    def insert(self, parent, index, values, **kw):
+        iid = f"I{next(self._ids)}"
+        self.rows[iid] = tuple(values)
+        self.order.insert(len(self.order) if index == "end" else index, iid)
+        return iid
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.order.remove(iid)
+            del self.rows[iid]
+
+    def get_children(self):
+        return list(self.order)
+
+    def item(self, iid, values):
+        self.writes += 1
+        self.rows[iid] = values
+
+
+def binder(n):
+    tree = FakeTree()
+    rows = RowBinder(tree)
+    for i in range(n):
+        rows.add(f"f{i}", ("✔", f"f{i}", "", ""))
+    return tree, rows
+
+
+def test_unchanged_values_are_not_written():
+    tree, rows = binder(1000)
+    rows.set_all("est_size", "")
+    rows.set("f1", "status", "")
+    rows.flush()
+    assert tree.writes == 0
+
+    rows.set("f1", "est_size", "12.5")
+    rows.set_all("est_size", "")
+    rows.flush()
+    assert tree.writes == 1
+
+
+def test_updates_merge_per_row():
+    tree, rows = binder(3)
+    rows.set("f0", "status", "running")
+    rows.set("f0", "status", "done")
+    rows.set("f0", "est_size", "3")
+    rows.flush()
+    assert tree.writes == 1
+    assert tree.rows[rows.iid("f0")] == ("✔", "f0", "3", "done")
+
+
+def test_remove_and_insert_at_index():
+    tree, rows = binder(3)
+    rows.set("f1", "status", "running")
+    rows.remove("f1")
+    rows.flush()
+    rows.add("new", ("✔", "new", "", ""), index=1)
+    assert [rows.key(i) for i in tree.get_children()] == ["f0", "new", "f2"]
+    assert rows.iid("f1") is None
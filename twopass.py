@@ -0,0 +1,174 @@
+# twopass.py
+# Target-size mode: video bitrate from probed duration, two-pass libx264/libx265
+# (or a given target bitrate, used as-is)
+# First-pass stats are kept per (file, encode settings) and reused on re-targeting;
+# the cache folder is trimmed LRU to TWOPASS_CACHE_MB after every run
+
+import hashlib
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from config import TWOPASS_CACHE_DIR, TWOPASS_CACHE_MB
+from ffmpeg_args import (split_args, join_args, get_opt, set_opt, remove_opts,
+                         video_codec, parse_kbps)
+from ffmpeg_runner import run_ffmpeg, build_command
+from file_manager import file_fingerprint, probe_media
+
+TWOPASS_ENCODERS = ("libx264", "libx265")
+
+# Options that only describe the rate target; stats don't depend on them
+RATE_OPTS = ("-crf", "-b:v", "-maxrate", "-bufsize", "-global_quality")
+
+# Leave room for container overhead
+MUX_OVERHEAD = 0.98
+MIN_VIDEO_KBPS = 100
+
+_dir_locks = {}            # stats folder -> [lock, users]; only folders in use
+_dir_locks_guard = threading.Lock()
+
+
+def supports_two_pass(args):
+    return video_codec(args) in TWOPASS_ENCODERS
+
+
+def target_video_kbps(size_mb, duration_sec, audio_kbps=128):
+    """Video bitrate that lands the whole file at size_mb (same MB as estimate_size_mb)."""
+    if duration_sec <= 0:
+        return None
+    total_kbps = size_mb * 1024 * 8 / duration_sec * MUX_OVERHEAD
+    return max(MIN_VIDEO_KBPS, int(total_kbps - audio_kbps))
+
+
+def stats_dir(path, args):
+    """Per-job pass-log folder. Concurrent jobs never share a passlog name."""
+    base = remove_opts(args, *RATE_OPTS)
+    key = hashlib.sha1(f"{file_fingerprint(path)}|{base}".encode()).hexdigest()[:20]
+    d = os.path.abspath(os.path.join(TWOPASS_CACHE_DIR, key))
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+@contextmanager
+def _dir_lock(d, blocking=True):
+    """Hold the per-folder lock; yields whether it was acquired."""
+    with _dir_locks_guard:
+        entry = _dir_locks.setdefault(d, [threading.Lock(), 0])
+        entry[1] += 1
+    acquired = entry[0].acquire(blocking)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            entry[0].release()
+        with _dir_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _dir_locks[d]
+
+
+def evict(max_mb=TWOPASS_CACHE_MB):
+    """Drop least recently used stats folders until the cache fits its budget.
+    Folders of running jobs are left alone."""
+    try:
+        names = os.listdir(TWOPASS_CACHE_DIR)
+    except OSError:
+        return
+    entries = []
+    total = 0
+    for name in names:
+        d = os.path.abspath(os.path.join(TWOPASS_CACHE_DIR, name))
+        try:
+            size = sum(e.stat().st_size for e in os.scandir(d) if e.is_file())
+            entries.append((os.path.getmtime(d), size, d))
+        except OSError:
+            continue
+        total += size
+
+    for _, size, d in sorted(entries):
+        if total <= max_mb * 1024 * 1024:
+            break
+        with _dir_lock(d, blocking=False) as free:
+            if not free:
+                continue
+            shutil.rmtree(d, ignore_errors=True)
+        total -= size
+
+
+def _pass_args(args, kbps, n):
+    args = set_opt(remove_opts(args, *RATE_OPTS), "-b:v", f"{kbps}k")
+
+    if video_codec(args) == "libx265":
+        # Stats path is relative (FFmpeg runs inside the stats folder) since
+        # x265-params is ':'-separated and can't carry a Windows drive letter
+        params = get_opt(args, "-x265-params")
+        extra = f"pass={n}:stats=x265.log"
+        args = set_opt(args, "-x265-params", f"{params}:{extra}" if params else extra)
+    else:
+        args += f" -pass {n} -passlogfile x264"
+
+    if n == 1:
+        # First pass only gathers stats: no audio, no output file
+        pairs = [(o, v) for o, v in split_args(args)
+                 if o not in ("-c:a", "-b:a", "-af", "-movflags")]
+        args = join_args(pairs) + " -an -f null"
+    return args
+
+
+def _job_kbps(args, target_mb, duration, target_kbps=None):
+    if target_kbps:
+        return max(MIN_VIDEO_KBPS, int(target_kbps))
+    audio_kbps = parse_kbps(get_opt(args, "-b:a")) or 128
+    return target_video_kbps(target_mb, duration or 0, audio_kbps)
+
+
+def pass_commands(infile, outfile, args, target_mb, duration, target_kbps=None):
+    """argv of both passes as run_two_pass runs them (inside the stats folder),
+    or None when a target size is given and the duration is unknown."""
+    kbps = _job_kbps(args, target_mb, duration, target_kbps)
+    if not kbps:
+        return None
+    return [build_command(infile, "-", _pass_args(args, kbps, 1)),
+            build_command(infile, outfile, _pass_args(args, kbps, 2))]
+
+
+def run_two_pass(job, on_progress=None, on_start=None, log=None):
+    """Encode job.path at job.target_kbps, or to roughly job.target_mb.
+    Returns the FFmpeg return code.
+
+    log receives status messages only, not FFmpeg output.
+    """
+    if job.target_kbps:
+        kbps = _job_kbps(job.args, None, None, job.target_kbps)
+    else:
+        kbps = _job_kbps(job.args, job.target_mb, probe_media(job.path).get("duration"))
+    if not kbps:
+        if log:
+            log("two-pass: unknown duration, cannot compute bitrate")
+        return -1
+
+    infile = os.path.abspath(job.path)
+    outfile = os.path.abspath(job.outfile)
+    d = stats_dir(infile, job.args)
+    done_marker = os.path.join(d, "pass1.done")
+
+    try:
+        with _dir_lock(d):
+            # The run may have been waiting on an eviction of this folder
+            os.makedirs(d, exist_ok=True)
+            os.utime(d)                         # LRU touch
+            if not os.path.exists(done_marker):
+                p = run_ffmpeg(infile, "-", _pass_args(job.args, kbps, 1),
+                               on_progress=on_progress, on_start=on_start, cwd=d)
+                if p.wait() != 0:
+                    return p.returncode
+                open(done_marker, "w").close()
+            elif log:
+                log("two-pass: reusing first-pass stats")
+
+            p = run_ffmpeg(infile, outfile, _pass_args(job.args, kbps, 2),
+                           on_progress=on_progress, on_start=on_start, cwd=d)
+            return p.wait()
+    finally:
+        evict()
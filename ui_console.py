@@ -1,19 +1,35 @@
 # ui_console.py
 # FFmpeg log console display UI component
+# log_line() is thread-safe: it publishes a "log" event on the bus, and the
+# owner's tick hands the drained lines to write(), which appends them in one
+# batch and trims the widget to MAX_LOG_LINES
 
 import tkinter as tk
 from tkinter import ttk
 
+from config import MAX_LOG_LINES
+
 class ConsoleUI:
-    def __init__(self, root):
+    def __init__(self, root, bus, max_lines=MAX_LOG_LINES):
         self.frame = ttk.LabelFrame(root, text="FFmpeg Console")
         self.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
         self.log = tk.Text(self.frame, height=10, wrap="word")
         self.log.pack(fill="both", expand=True)
 
+        self.bus = bus
+        self.max_lines = max_lines
+
     def log_line(self, text):
-        def append():
-            self.log.insert("end", text + "\n")
-            self.log.see("end")
-        self.log.after(0, append)
+        self.bus.publish("log", msg=text, source="gui")
+
+    def write(self, lines):
+        """Tk thread only."""
+        if not lines:
+            return
+        lines = lines[-self.max_lines:]
+        self.log.insert("end", "\n".join(lines) + "\n")
+        count = int(self.log.index("end-1c").split(".")[0]) - 1
+        if count > self.max_lines:
+            self.log.delete("1.0", f"{count - self.max_lines + 1}.0")
+        self.log.see("end")
@@ -8,28 +8,35 @@ from tkinter import ttk, filedialog, messagebox
 import threading, os
 import queue
 import time
+from collections import OrderedDict
 
-from presets import load_presets
-from file_manager import scan_folder, get_resolution, get_duration
-from ffmpeg_runner import run_ffmpeg
-from ui_preset_editor import PresetEditor
-from estimations import estimate_size_mb
-
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-
+# Only what the first frame needs is imported here. Watchdog, the preset
+# editor, estimation and the probe/batch machinery load on first use.
+from presets import get_presets
+from config import ORDER_POLICIES, EVENT_TICK_MS, THUMBS_KEPT
 from button import ThemedToggleButton
+from ui_tree import RowBinder, FileRecord
+from ui_console import ConsoleUI
+from event_bus import EventBus
 
 
 # ---------------- FOLDER WATCH HANDLER ----------------
 
-class FolderWatchHandler(FileSystemEventHandler):
-    def __init__(self, queue):
-        self.queue = queue
+def make_watch_handler(queue):
+    from watchdog.events import FileSystemEventHandler
+
+    class FolderWatchHandler(FileSystemEventHandler):
+        def __init__(self, queue):
+            self.queue = queue
+
+        def on_any_event(self, event):
+            if not event.is_directory:
+                self.queue.put(event.src_path)
+                dest = getattr(event, "dest_path", None)
+                if dest:
+                    self.queue.put(dest)
 
-    def on_any_event(self, event):
-        if not event.is_directory:
-            self.queue.put(True)
+    return FolderWatchHandler(queue)
 
 
 # ---------------- MAIN GUI ----------------
@@ -38,18 +45,33 @@ class FFmpegGUI:
     def __init__(self, root):
 
         self.root = root
-        self.presets = load_presets()
+        self.presets = get_presets()
         self.files = []
+        self.file_index = {}        # path -> file record
         self.current_folder = None
         self.output_dir = None
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
-        self.active_processes = []
+        self.engine = None
+        self.ingest_engine = None
+        self.ingest = None
+        self.farm = None
+        self.active_preset = None
+
+        # Workers publish here; the Tk thread drains it on a fixed tick
+        self.bus = EventBus()
+        self.events = self.bus.subscribe()
         self.is_running = False
 
         # ---------- MENU BAR ----------
         menubar = tk.Menu(self.root)
         
         file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Run Job File...", command=self.run_job_file)
+        file_menu.add_command(label="Package Selected as HLS/DASH...", command=self.package_selected)
+        file_menu.add_separator()
+        file_menu.add_command(label="Serve Selected to Farm Workers", command=self.serve_farm)
+        file_menu.add_command(label="Stop Farm Coordinator", command=self.stop_farm)
+        file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.on_close)
         
         menubar.add_cascade(label="File", menu=file_menu)
@@ -91,6 +113,7 @@ class FFmpegGUI:
 
         self.auto_subfolder_var = tk.BooleanVar(value=False)
         self.estimate_size_var = tk.BooleanVar(value=False)
+        self.smart_copy_var = tk.BooleanVar(value=True)
 
         opts = ttk.Frame(root)
         opts.pack(fill="x", padx=8, pady=2)
@@ -99,17 +122,61 @@ class FFmpegGUI:
                         variable=self.auto_subfolder_var).pack(side="left", padx=5)
 
         ttk.Checkbutton(opts, text="Estimate output size",
-                        variable=self.estimate_size_var).pack(side="left", padx=15)
+                        variable=self.estimate_size_var,
+                        command=self.update_active_args).pack(side="left", padx=15)
+        self.estimator = None
+
+        ttk.Checkbutton(opts, text="Stream-copy when source already matches",
+                        variable=self.smart_copy_var).pack(side="left", padx=15)
+
+        self.auto_ingest_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opts, text="Auto-convert new files",
+                        variable=self.auto_ingest_var,
+                        command=self.toggle_ingest).pack(side="left", padx=15)
+
+        self.dedup_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(opts, text="Encode duplicates once",
+                        variable=self.dedup_var).pack(side="left", padx=15)
+
+        self.auto_crf_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(opts, text="Auto CRF (quality floor)",
+                        variable=self.auto_crf_var).pack(side="left", padx=15)
+
+        ttk.Label(opts, text="Order:").pack(side="left", padx=(15, 5))
+        self.order_box = ttk.Combobox(opts, values=list(ORDER_POLICIES),
+                                      width=14, state="readonly")
+        self.order_box.current(0)
+        self.order_box.pack(side="left")
+        self.order_box.bind("<<ComboboxSelected>>", self.change_order)
+
+        ttk.Label(opts, text="Workers:").pack(side="left", padx=(15, 5))
+        self.workers_var = tk.IntVar(value=1)
+        ttk.Spinbox(opts, from_=1, to=os.cpu_count() or 4, width=4,
+                    textvariable=self.workers_var).pack(side="left")
+
+        ttk.Label(opts, text="Target size (MB):").pack(side="left", padx=(15, 5))
+        self.target_mb_var = tk.StringVar()
+        ttk.Entry(opts, textvariable=self.target_mb_var, width=7).pack(side="left")
+
+        ttk.Label(opts, text="or bitrate (kbps):").pack(side="left", padx=(10, 5))
+        self.target_kbps_var = tk.StringVar()
+        ttk.Entry(opts, textvariable=self.target_kbps_var, width=7).pack(side="left")
 
         # ---------- FILE TABLE ----------
         self.tree = ttk.Treeview(
             root,
             columns=("use", "in", "out", "ext", "res",
-                     "op_res", "op_fmt", "cur_size", "est_size"),
-            show="headings",
+                     "op_res", "op_fmt", "cur_size", "est_size",
+                     "status", "pct", "speed"),
+            show="tree headings",
             selectmode="none"
         )
 
+        # Tree column (#0) holds the lazily loaded thumbnail
+        ttk.Style().configure("Treeview", rowheight=50)
+        self.tree.heading("#0", text="Preview")
+        self.tree.column("#0", width=96, stretch=False)
+
         for col, text, width in [
             ("use", "Use", 50),
             ("in", "Input File", 320),
@@ -119,13 +186,38 @@ class FFmpegGUI:
             ("res", "Resolution", 110),
             ("op_res", "Output Resolution", 140),
             ("op_fmt", "Output Format", 90),
-            ("est_size", "Est. Output (MB)", 130)
+            ("est_size", "Est. Output (MB)", 130),
+            ("status", "Status", 90),
+            ("pct", "Progress", 80),
+            ("speed", "Speed", 70)
         ]:
             self.tree.heading(col, text=text)
             self.tree.column(col, width=width, anchor="center")
 
         self.tree.pack(fill="both", expand=True)
         self.tree.bind("<Button-1>", self.toggle_checkbox)
+        self.tree.bind("<Button-3>", self.show_row_menu)
+        self.tree.bind("<Configure>", self.schedule_thumbnails)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+
+        # Rows are addressed by file path; cell changes flush at ~30 Hz
+        self.rows = RowBinder(self.tree)
+
+        self.thumbs = OrderedDict()  # path -> PhotoImage (keeps Tk refs alive), LRU order
+        self.thumbs_requested = set()
+        self.thumb_job = None
+        self.preview_pool = None
+
+        # ---------- ROW MENU (priority / pinning) ----------
+        self.row_menu = tk.Menu(self.root, tearoff=0)
+        self.row_menu.add_command(label="Promote", command=lambda: self.change_priority(1))
+        self.row_menu.add_command(label="Demote", command=lambda: self.change_priority(-1))
+        self.row_menu.add_separator()
+        self.row_menu.add_command(label="Pin to top", command=lambda: self.set_pinned(True))
+        self.row_menu.add_command(label="Unpin", command=lambda: self.set_pinned(False))
+        self.row_menu.add_separator()
+        self.row_menu.add_command(label="Preview with preset", command=self.preview_row)
+        self.menu_path = None
 
         # ---------- PRESETS ----------
         sorted_presets = sorted(
@@ -158,6 +250,7 @@ class FFmpegGUI:
             state="readonly"
         )
         self.active_args_entry.pack(side="left", fill="x", expand=True, padx=5)
+        ttk.Button(args_frame, text="Dry Run", command=self.dry_run).pack(side="left")
 
         # ---------- START BUTTON ----------
         #self.start_btn = ttk.Button(root, text="Start Conversion",command=self.toggle_start)
@@ -172,11 +265,8 @@ class FFmpegGUI:
         self.progress.configure(maximum=100)
 
         # ---------- GUI CONSOLE ----------
-        log_frame = ttk.LabelFrame(self.root, text="FFmpeg Console")
-        log_frame.pack(fill="both", expand=True, padx=8, pady=6)
-
-        self.log = tk.Text(log_frame, height=10, wrap="word")
-        self.log.pack(fill="both", expand=True)
+        self.console = ConsoleUI(self.root, self.bus)
+        self.root.after(EVENT_TICK_MS, self.drain_events)
 
         self.update_active_args()
 
@@ -186,7 +276,9 @@ class FFmpegGUI:
     def start_folder_watcher(self, folder):
         self.stop_folder_watcher()
 
-        handler = FolderWatchHandler(self.fs_queue)
+        from watchdog.observers import Observer
+
+        handler = make_watch_handler(self.fs_queue)
         self.fs_observer = Observer()
         self.fs_observer.schedule(handler, folder, recursive=False)
         self.fs_observer.daemon = True
@@ -207,8 +299,10 @@ class FFmpegGUI:
         refreshed = False
         while not self.fs_queue.empty():
             try:
-                self.fs_queue.get_nowait()
+                path = self.fs_queue.get_nowait()
                 refreshed = True
+                if self.ingest:
+                    self.ingest.note(path)
             except:
                 pass
 
@@ -216,13 +310,69 @@ class FFmpegGUI:
             self.refresh_files()
             self.log_line("📂 Folder auto-synced")
 
+        if self.ingest:
+            for path in self.ingest.poll():
+                self.ingest_file(path)
+
         self.root.after(1000, self.poll_fs_changes)
 
 
+    # ================= WATCH-FOLDER INGEST =================
+
+    def toggle_ingest(self):
+        if self.auto_ingest_var.get():
+            self.start_ingest()
+        else:
+            self.stop_ingest()
+
+    def start_ingest(self):
+        if not self.current_folder:
+            self.auto_ingest_var.set(False)
+            messagebox.showinfo("Auto-convert", "Select a folder to watch first")
+            return
+
+        from batch_engine import BatchEngine
+        from file_manager import scan_folder
+        from watch_ingest import IngestTracker
+
+        self.ingest = IngestTracker()
+        self.ingest.mark_seen(scan_folder(self.current_folder))
+
+        # Long-lived pool: never finish()ed, jobs arrive as files settle
+        self.ingest_engine = BatchEngine(
+            workers=self.workers_var.get(),
+            smart_copy=self.smart_copy_var.get(),
+            bus=self.bus,
+            source="ingest"
+        )
+        self.ingest_engine.start()
+        self.log_line(f"👀 Auto-converting new files in {self.current_folder}")
+
+    def stop_ingest(self):
+        self.ingest = None
+        if self.ingest_engine:
+            # Let queued/running jobs complete (engine kept for on_close)
+            self.ingest_engine.finish()
+            self.log_line("👀 Auto-convert off")
+
+    def ingest_file(self, path):
+        from audio_pipeline import output_ext
+        from file_manager import build_output_name
+        from job_queue import Job
+
+        args = self.active_args_var.get()
+        outfile = build_output_name(path, self.output_dir, ext=output_ext(args))
+        self.ingest.add_output(outfile)
+        job = Job(path, outfile, args)
+        job.plugins = self.preset_plugins()
+        self.ingest_engine.submit(job)
+        self.log_line(f"📥 Queued {os.path.basename(path)}")
+
+
     # ================= PRESETS =================
 
     def refresh_presets(self):
-        self.presets = load_presets()
+        self.presets = get_presets()
         sorted_presets = sorted(
             self.presets.items(),
             key=lambda x: (x[1].get("category", ""), x[0])
@@ -238,6 +388,7 @@ class FFmpegGUI:
         self.update_active_args()
 
     def open_preset_editor(self):
+        from ui_preset_editor import PresetEditor
         PresetEditor(self.root, self.presets, self.refresh_presets)
 
 
@@ -263,60 +414,183 @@ class FFmpegGUI:
         self.load_files("all")
         self.start_folder_watcher(folder)
 
+        if self.auto_ingest_var.get():
+            self.stop_ingest()
+            self.start_ingest()
+
     def load_files(self, ext_filter):
-        self.tree.delete(*self.tree.get_children())
-        self.files.clear()
+        """(Re)list the folder against the current rows: files still listed
+        keep their row, selection and job status / progress, vanished ones
+        are removed and new ones inserted in place. Auto-sync runs this
+        about once a second while outputs are written to the folder."""
+        from file_manager import scan_folder, get_resolution
+
+        paths = []
+        for p in scan_folder(self.current_folder):
+            if not os.path.exists(p):
+                continue
+            ext_clean = os.path.splitext(p)[1].lstrip(".").lower()
+            if ext_filter != "all" and ext_clean != ext_filter:
+                continue
+            paths.append(p)
 
-        paths = scan_folder(self.current_folder)
+        listed = set(paths)
+        for p in [p for p in self.file_index if p not in listed]:
+            self.rows.remove(p)
+            del self.file_index[p]
 
-        for p in paths:
-            if not os.path.exists(p):
+        files = []
+        for i, p in enumerate(paths):
+            try:
+                cur_size = round(os.path.getsize(p)/(1024*1024), 2)
+            except:
+                cur_size = "?"
+
+            record = self.file_index.get(p)
+            if record:
+                self.rows.set(p, "cur_size", cur_size)
+                files.append(record)
                 continue
 
             base, ext = os.path.splitext(os.path.basename(p))
             ext_clean = ext.lstrip(".").lower()
 
-            if ext_filter != "all" and ext_clean != ext_filter:
-                continue
-
             try:
                 res = get_resolution(p)
             except:
                 res = "unknown"
 
-            try:
-                cur_size = round(os.path.getsize(p)/(1024*1024), 2)
-            except:
-                cur_size = "?"
-
-            self.files.append({"path": p, "use": True})
+            record = FileRecord(p)
+            files.append(record)
+            self.file_index[p] = record
 
             row = ("✔", base, base, f".{ext_clean}",
-                   res, "Same", ext_clean, cur_size, "")
-            self.tree.insert("", "end", values=row)
+                   res, "Same", ext_clean, cur_size, "", "", "", "")
+            if p in self.thumbs:
+                self.rows.add(p, row, index=i, image=self.thumbs[p])
+            else:
+                self.rows.add(p, row, index=i)
+        self.files[:] = files
+
+        # Only thumbnails for listed files are kept alive
+        self.thumbs = OrderedDict((p, img) for p, img in self.thumbs.items() if p in self.file_index)
+        self.thumbs_requested &= self.file_index.keys()
+
+        self.schedule_thumbnails()
 
     def apply_filter(self, event=None):
         if self.current_folder:
             self.load_files(self.ext_filter.get())
 
 
+    # ================= THUMBNAILS / PREVIEW =================
+
+    def get_preview_pool(self):
+        if self.preview_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            from preview_cache import PreviewCache
+
+            self.preview_cache = PreviewCache()
+            # One thumbnail pass at a time keeps the background load light
+            self.preview_pool = ThreadPoolExecutor(max_workers=1)
+            self.filter_pool = ThreadPoolExecutor(max_workers=1)
+        return self.preview_pool
+
+    def on_tree_scroll(self, first, last):
+        self.schedule_thumbnails()
+
+    def schedule_thumbnails(self, event=None):
+        # Coalesce bursts of scroll/resize events
+        if self.thumb_job:
+            self.root.after_cancel(self.thumb_job)
+        self.thumb_job = self.root.after(150, self.load_visible_thumbnails)
+
+    def load_visible_thumbnails(self):
+        self.thumb_job = None
+        rows = self.tree.get_children()
+        if not rows:
+            return
+
+        first, last = self.tree.yview()
+        start = int(first * len(rows))
+        end = min(len(rows), int(last * len(rows)) + 1)
+
+        for iid in rows[start:end]:
+            path = self.rows.key(iid)
+            if path in self.thumbs:
+                self.thumbs.move_to_end(path)
+                continue
+            if path in self.thumbs_requested:
+                continue
+            self.thumbs_requested.add(path)
+            self.get_preview_pool().submit(self._thumbnail_worker, path)
+
+    def _thumbnail_worker(self, path):
+        from preview_cache import extract_thumbnails
+
+        frames = extract_thumbnails(self.preview_cache, path)
+        if frames:
+            # Middle frame is the most representative
+            self.bus.publish("thumbnail", path=path, png=frames[len(frames) // 2])
+
+    def _set_thumbnail(self, path, png):
+        try:
+            self.thumbs[path] = tk.PhotoImage(file=png)
+        except tk.TclError:
+            return
+        self.thumbs.move_to_end(path)
+        iid = self.rows.iid(path)
+        if iid:
+            self.tree.item(iid, image=self.thumbs[path])
+
+        # Rows scrolled far away give their image back; the disk cache
+        # makes it cheap to fetch again when they return
+        while len(self.thumbs) > THUMBS_KEPT:
+            old, _ = self.thumbs.popitem(last=False)
+            self.thumbs_requested.discard(old)
+            old_iid = self.rows.iid(old)
+            if old_iid:
+                self.tree.item(old_iid, image="")
+
+    def preview_row(self):
+        if self.menu_path is None:
+            return
+        from ffmpeg_args import get_opt
+
+        path = self.menu_path
+        vf = get_opt(self.active_args_var.get(), "-vf")
+        self.get_preview_pool()
+        self.filter_pool.submit(self._preview_worker, path, vf)
+        self.log_line(f"🖼 Rendering preview of {os.path.basename(path)}...")
+
+    def _preview_worker(self, path, vf):
+        from preview_cache import render_filter_preview
+
+        png = render_filter_preview(self.preview_cache, path, vf)
+        self.bus.publish("preview", path=path, vf=vf, png=png)
+
+    def _show_preview(self, path, vf, png):
+        if not png:
+            self.log_line(f"❌ Preview failed for {os.path.basename(path)}")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Preview: {os.path.basename(path)}  [{vf or 'no filter'}]")
+        win.image = tk.PhotoImage(file=png)
+        ttk.Label(win, image=win.image).pack()
+
+
     # ================= CHECKBOXES =================
 
     def select_all(self):
-        for i in range(len(self.files)):
-            self.files[i]["use"] = True
-            row = self.tree.get_children()[i]
-            vals = list(self.tree.item(row, "values"))
-            vals[0] = "✔"
-            self.tree.item(row, values=vals)
+        for f in self.files:
+            f.use = True
+        self.rows.set_all("use", "✔")
 
     def uncheck_all(self):
-        for i in range(len(self.files)):
-            self.files[i]["use"] = False
-            row = self.tree.get_children()[i]
-            vals = list(self.tree.item(row, "values"))
-            vals[0] = ""
-            self.tree.item(row, values=vals)
+        for f in self.files:
+            f.use = False
+        self.rows.set_all("use", "")
 
     def toggle_checkbox(self, event):
         region = self.tree.identify("region", event.x, event.y)
@@ -324,13 +598,43 @@ class FFmpegGUI:
         if region != "cell" or col != "#1":
             return
 
+        f = self.file_index.get(self.rows.key(self.tree.identify_row(event.y)))
+        if not f:
+            return
+        f.use = not f.use
+        self.rows.set(f.path, "use", "✔" if f.use else "")
+
+
+    # ================= PRIORITY / PINNING =================
+
+    def show_row_menu(self, event):
         row = self.tree.identify_row(event.y)
-        idx = self.tree.index(row)
-        self.files[idx]["use"] = not self.files[idx]["use"]
+        if not row:
+            return
+        self.menu_path = self.rows.key(row)
+        self.row_menu.tk_popup(event.x_root, event.y_root)
 
-        vals = list(self.tree.item(row, "values"))
-        vals[0] = "✔" if self.files[idx]["use"] else ""
-        self.tree.item(row, values=vals)
+    def change_priority(self, delta):
+        f = self.file_index.get(self.menu_path)
+        if not f:
+            return
+        f.priority += delta
+        if self.engine:
+            self.engine.set_priority(f.path, f.priority)
+        self.log_line(f"↕ {os.path.basename(f.path)}: priority {f.priority}")
+
+    def set_pinned(self, pinned):
+        f = self.file_index.get(self.menu_path)
+        if not f:
+            return
+        f.pinned = pinned
+        if self.engine:
+            self.engine.set_pinned(f.path, pinned)
+        self.log_line(f"📌 {os.path.basename(f.path)}: {'pinned' if pinned else 'unpinned'}")
+
+    def change_order(self, event=None):
+        if self.engine:
+            self.engine.set_policy(ORDER_POLICIES[self.order_box.get()])
 
 
     # ================= START / STOP =================
@@ -342,56 +646,304 @@ class FFmpegGUI:
             self.stop_conversion()
 
     def start_conversion(self):
+        from batch_engine import BatchEngine
+        from twopass import supports_two_pass
+
         self.is_running = True
         #self.start_btn.configure(text="Stop Conversion")
         self.start_btn.set_running(True)
-        threading.Thread(target=self.start, daemon=True).start()
+
+        # Tk state is read here, on the Tk thread; the engine runs before any
+        # job is built so Stop works from the first moment
+        selected = [(f.path, f.priority, f.pinned) for f in self.files if f.use]
+        args = self.active_args_var.get()
+        target_mb, target_kbps = self.get_target_mb(), self.get_target_kbps()
+        if (target_mb or target_kbps) and not supports_two_pass(args):
+            self.log_line("⚠ Target size / bitrate needs a libx264/libx265 preset, encoding normally")
+            target_mb = target_kbps = None
+        options = {
+            "target_mb": target_mb,
+            "target_kbps": target_kbps,
+            "auto_crf": self.auto_crf_var.get(),
+            "plugins": self.preset_plugins(),
+            "dedup": self.dedup_var.get(),
+        }
+
+        self.total = len(selected)
+        self.done = 0
+
+        self.engine = BatchEngine(
+            workers=self.workers_var.get(),
+            policy=ORDER_POLICIES[self.order_box.get()],
+            smart_copy=self.smart_copy_var.get(),
+            bus=self.bus
+        )
+        self.engine.start()
+        threading.Thread(target=self.start, args=(self.engine, selected, args, options),
+                         daemon=True).start()
 
     def stop_conversion(self):
         self.is_running = False
         #self.start_btn.configure(text="Start Conversion")
         self.start_btn.set_running(False)
 
-        for p in self.active_processes:
-            try:
-                #os.kill(p.pid, signal.SIGTERM)
-                os.kill(p.pid, signal.SIGINT)
-            except:
-                pass
+        if self.engine:
+            self.engine.stop()
 
-        self.active_processes.clear()
         self.log_line("⛔ Conversion stopped by user")
 
 
     # ================= FFmpeg WORKER (AUTO-REFRESH WIRED) =================
 
-    def start(self):
-        self.active_processes.clear()
+    def start(self, engine, selected, args, options):
+        """Build and submit the jobs (off the Tk thread). Durations are probed
+        by the engine in the background, so the first encode starts at once."""
+        from audio_pipeline import output_ext
+        from dedup import find_duplicates
+        from file_manager import build_output_name
+        from job_queue import Job
+
+        ext = output_ext(args)
+
+        # Identical inputs: encode the first, link the result for the rest
+        dupes = {}
+        if options["dedup"]:
+            for group in find_duplicates([path for path, _, _ in selected]):
+                if not engine.running:
+                    break
+                dupes[group[0]] = group[1:]
+                names = ", ".join(os.path.basename(p) for p in group[1:])
+                self.log_line(f"🔗 {os.path.basename(group[0])} also covers: {names}")
+        skip = {p for group in dupes.values() for p in group}
+
+        for path, priority, pinned in selected:
+            if not engine.running:
+                break               # stopped while jobs were being built
+            if path in skip:
+                continue
+            job = Job(path, build_output_name(path, self.output_dir, ext=ext), args,
+                      priority=priority, pinned=pinned)
+            job.target_mb = options["target_mb"]
+            job.target_kbps = options["target_kbps"]
+            job.auto_crf = options["auto_crf"]
+            job.plugins = options["plugins"]
+            job.duplicates = [(p, build_output_name(p, self.output_dir, ext=ext))
+                              for p in dupes.get(path, [])]
+            engine.submit(job)
+
+        engine.finish()
+
+    def preset_plugins(self):
+        """Engine plugins (probe / executor / post_step) named by the active preset."""
+        preset = self.presets.get(self.active_preset, {})
+        return {k: preset[k] for k in ("probe", "executor", "post_step") if k in preset}
+
+    def get_target_mb(self):
+        try:
+            value = float(self.target_mb_var.get())
+        except ValueError:
+            return None
+        return value if value > 0 else None
+
+    def get_target_kbps(self):
+        try:
+            value = int(float(self.target_kbps_var.get()))
+        except ValueError:
+            return None
+        return value if value > 0 else None
+
+    # ================= EVENTS =================
+
+    def drain_events(self):
+        """Tk tick: apply everything published since the last tick."""
+        logs = []
+        for ev in self.events.drain():
+            source = ev.data.get("source")
+            if ev.kind == "log":
+                logs.append(ev.data["msg"])
+            elif ev.kind == "job_start":
+                self.job_started(ev.job)
+            elif ev.kind == "progress":
+                self.job_progress(ev.job, ev.data["sec"])
+            elif ev.kind == "job_done" and source == "ingest":
+                self.rows.set(ev.job.path, "status", ev.job.status)
+                logs.append(f"📥 Auto-converted {os.path.basename(ev.job.path)}: {ev.job.status}")
+            elif ev.kind == "job_done":
+                self.job_done(ev.job)
+            elif ev.kind == "finished" and source == "batch":
+                self.batch_finished()
+            elif ev.kind == "thumbnail":
+                self._set_thumbnail(ev.data["path"], ev.data["png"])
+            elif ev.kind == "preview":
+                self._show_preview(ev.data["path"], ev.data["vf"], ev.data["png"])
+            elif ev.kind == "plan":
+                # Opens a save dialog; run it after this tick, not inside it
+                self.root.after_idle(self._show_plan, ev.data["plan"])
+        self.console.write(logs)
+        self.root.after(EVENT_TICK_MS, self.drain_events)
+
+    # Job handlers run on the Tk thread, called from drain_events
+
+    def job_started(self, job):
+        self.rows.set(job.path, "status", "running")
+        self.rows.set(job.path, "pct", "0%")
+
+    def job_progress(self, job, sec):
+        if job.duration:
+            self.rows.set(job.path, "pct", f"{min(100, int(sec / job.duration * 100))}%")
+        if job.speed:
+            self.rows.set(job.path, "speed", f"{job.speed:.2f}x")
+
+    def job_done(self, job):
+        status = f"{job.status}: {job.error}" if job.status == "failed" and job.error else job.status
+        for path in [job.path] + [p for p, _ in job.duplicates]:
+            self.rows.set(path, "status", status)
+            if job.status.startswith("done"):
+                self.rows.set(path, "pct", "100%")
+        self.done += 1 + len(job.duplicates)
+        self.progress.configure(value=int((self.done/max(self.total, 1))*100))
+
+    def batch_finished(self):
+        # ===== AUTO-REFRESH AFTER FINISH =====
+        self.root.after(500, self.refresh_files)
+        self.root.after(600, lambda: self.log_line("✅ Conversion finished. Files auto-refreshed"))
+        if self.engine:
+            self.log_line("   " + ", ".join(f"{k}: {v}" for k, v in sorted(self.engine.counts.items())))
 
-        selected = [f for f in self.files if f.get("use")]
+        self.is_running = False
+        #self.start_btn.configure(text="Start Conversion")
+        self.start_btn.set_running(False)
 
-        total = len(selected)
-        done = 0
 
-        for f in selected:
-            if not self.is_running:
-                break
+    # ================= DRY RUN / JOB FILES =================
 
-            p = run_ffmpeg(f["path"], self.output_dir, self.active_args_var.get())
-            self.active_processes.append(p)
-            p.wait()
+    def dry_run(self):
+        selected = [f.path for f in self.files if f.use]
+        if not selected:
+            return
+        self.log_line(f"🧾 Planning {len(selected)} files...")
+        # Tk variables are read here, on the Tk thread
+        options = {
+            "preset": self.active_preset,
+            "smart_copy": self.smart_copy_var.get(),
+            "target_mb": self.get_target_mb(),
+            "target_kbps": self.get_target_kbps(),
+            "auto_crf": self.auto_crf_var.get(),
+            "plugins": self.preset_plugins(),
+            "order": {f.path: (f.priority, f.pinned) for f in self.files if f.use},
+        }
+        threading.Thread(target=self._plan_worker,
+                         args=(selected, self.active_args_var.get(), options), daemon=True).start()
+
+    def _plan_worker(self, paths, args, options):
+        from dry_run import plan_batch
+
+        plan = plan_batch(paths, args, self.output_dir, **options)
+        self.bus.publish("plan", plan=plan)
+
+    def _show_plan(self, plan):
+        from dry_run import format_report, save_plan
+
+        for line in format_report(plan, self.workers_var.get()):
+            self.log_line(line)
+
+        path = filedialog.asksaveasfilename(
+            title="Save job file", defaultextension=".json",
+            filetypes=[("Job file", "*.json")])
+        if path:
+            save_plan(plan, path)
+            self.log_line(f"💾 Job file saved: {path}")
+
+    def run_job_file(self):
+        from dry_run import load_plan, plan_engine
+
+        if self.is_running:
+            return
+        path = filedialog.askopenfilename(filetypes=[("Job file", "*.json")])
+        if not path:
+            return
+        try:
+            plan = load_plan(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Job file", str(e))
+            return
 
-            done += 1
-            progress = int((done/total)*100)
-            self.root.after(0, lambda v=progress: self.progress.configure(value=v))
+        self.total = sum(1 for j in plan["jobs"] if j["action"] != "skip")
+        self.done = 0
+        self.engine = plan_engine(
+            plan, self.workers_var.get(), bus=self.bus)
+        self.is_running = True
+        self.start_btn.set_running(True)
+        self.log_line(f"📂 Replaying {self.total} jobs from {os.path.basename(path)}")
+        self.engine.start()
+        self.engine.finish()
 
-        # ===== AUTO-REFRESH AFTER FINISH =====
-        self.root.after(500, self.refresh_files)
-        self.root.after(600, lambda: self.log_line("✅ Conversion finished. Files auto-refreshed"))
 
-        self.is_running = False
-        #self.root.after(0, lambda: self.start_btn.configure(text="Start Conversion"))
-        self.root.after(0, lambda: self.start_btn.set_running(False))
+    # ================= HLS / DASH PACKAGING =================
+
+    def package_selected(self):
+        selected = [f.path for f in self.files if f.use]
+        if not selected:
+            return
+        out = filedialog.askdirectory(title="Package output folder")
+        if not out:
+            return
+        dash = messagebox.askyesno("Packaging", "Also write a DASH manifest?")
+        self.log_line(f"📦 Packaging {len(selected)} renditions into {out}")
+        threading.Thread(target=self._package_worker, args=(selected, out, dash),
+                         daemon=True).start()
+
+    def _package_worker(self, paths, out, dash):
+        from stream_packaging import package
+
+        result = package(paths, out, dash=dash, log=self.log_line)
+        summary = ", ".join(f"{name}: {what}" for name, what in sorted(result.items()))
+        self.log_line(f"📦 Packaging finished ({summary})")
+
+
+    # ================= FARM (REMOTE WORKERS) =================
+
+    def serve_farm(self):
+        from audio_pipeline import output_ext
+        from farm import Coordinator
+        from file_manager import build_output_name
+        from job_queue import Job
+
+        if self.farm:
+            messagebox.showinfo("Farm", "The farm coordinator is already running")
+            return
+
+        selected = [f for f in self.files if f.use]
+        if not selected:
+            return
+
+        self.total = len(selected)
+        self.done = 0
+
+        try:
+            self.farm = Coordinator(
+                policy=ORDER_POLICIES[self.order_box.get()],
+                on_log=self.log_line,
+                on_job_done=lambda job: self.bus.publish("job_done", job, source="farm"),
+                on_finished=lambda: self.log_line("✅ Farm batch finished")
+            )
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Farm", f"Cannot start coordinator: {e}")
+            return
+
+        args = self.active_args_var.get()
+        for f in selected:
+            outfile = build_output_name(f.path, self.output_dir, ext=output_ext(args))
+            self.farm.submit(Job(f.path, outfile, args,
+                                 priority=f.priority, pinned=f.pinned))
+        self.farm.start()
+        self.log_line(f"🛰 {len(selected)} jobs waiting for farm workers")
+
+    def stop_farm(self):
+        if self.farm:
+            self.farm.stop()
+            self.farm = None
+            self.log_line("🛰 Farm coordinator stopped")
 
 
     # ================= REFRESH =================
@@ -407,14 +959,17 @@ class FFmpegGUI:
     # ================= LOG =================
 
     def log_line(self, msg):
-        self.log.insert("end", msg + "\n")
-        self.log.see("end")
+        # Safe from any thread: the console batches lines onto the Tk tick
+        self.console.log_line(msg)
 
 
     # ================= CLEAN SHUTDOWN =================
 
     def on_close(self):
-        running = [p for p in self.active_processes if p.poll() is None]
+        running = []
+        for engine in (self.engine, self.ingest_engine):
+            if engine:
+                running += engine.running_processes()
 
         if running:
             if not messagebox.askyesno(
@@ -432,6 +987,10 @@ class FFmpegGUI:
                     pass
 
         self.stop_folder_watcher()
+        self.stop_farm()
+        if self.preview_pool:
+            self.preview_pool.shutdown(wait=False, cancel_futures=True)
+            self.filter_pool.shutdown(wait=False, cancel_futures=True)
         self.root.destroy()
 
     def update_active_args(self, event=None):
@@ -444,19 +1003,21 @@ class FFmpegGUI:
             return  
 
         args = self.presets[preset_key]["args"]
+        self.active_preset = preset_key
         self.active_args_var.set(args)  
 
+        # Only rows still showing an estimate are touched (set_all skips equal cells)
+        if self.estimate_size_var.get() or self.estimator:
+            self.rows.set_all("est_size", "")
         if not self.estimate_size_var.get():
+            if self.estimator:
+                self.estimator.cancel()
             return  
 
-        for i, f in enumerate(self.files):
-            try:
-                duration = get_duration(f["path"])
-                est = estimate_size_mb(duration, args)  
+        if self.estimator is None:
+            from estimations import EstimationService
+            self.estimator = EstimationService(
+                lambda path, est: self.rows.set(path, "est_size", est if est else ""))
 
-                row_id = self.tree.get_children()[i]
-                vals = list(self.tree.item(row_id, "values"))
-                vals[8] = est if est else ""
-                self.tree.item(row_id, values=vals)
-            except:
-                pass
\ No newline at end of file
+        # Results stream into the table as they arrive
+        self.estimator.request([f.path for f in self.files], args)
\ No newline at end of file
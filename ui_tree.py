@@ -3,6 +3,7 @@
 # Treeview + file list UI + editing
 
 import os
+import threading
 from tkinter import ttk
 
 class TreeUI:
@@ -41,3 +42,98 @@ class TreeUI:
     def add_file(self, item, row):
         self.files.append(item)
         self.tree.insert("", "end", values=row)
+
+
+class RowBinder:
+    """Maps job/file keys to Treeview item ids and batches cell updates.
+
+    set() may be called from any thread; changes are merged per row and
+    written with one tree.item() call per dirty row on a ~30 Hz tick.
+    Writing a cell's current value is a no-op.
+    """
+
+    def __init__(self, tree, interval_ms=33):
+        self.tree = tree
+        self.columns = list(tree["columns"])
+        self.interval_ms = interval_ms
+        self.iids = {}        # key -> iid
+        self.keys = {}        # iid -> key
+        self.values = {}      # iid -> list of cell values (mirror of the tree)
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.tree.after(self.interval_ms, self._tick)
+
+    def add(self, key, values, index="end", **kw):
+        iid = self.tree.insert("", index, values=values, **kw)
+        with self.lock:
+            self.iids[key] = iid
+            self.keys[iid] = key
+            self.values[iid] = list(values)
+        return iid
+
+    def remove(self, key):
+        with self.lock:
+            iid = self.iids.pop(key, None)
+            if iid is None:
+                return
+            del self.keys[iid]
+            del self.values[iid]
+            self.dirty.discard(iid)
+        self.tree.delete(iid)
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        with self.lock:
+            self.iids.clear()
+            self.keys.clear()
+            self.values.clear()
+            self.dirty.clear()
+
+    def iid(self, key):
+        return self.iids.get(key)
+
+    def key(self, iid):
+        return self.keys.get(iid)
+
+    def set(self, key, column, value):
+        with self.lock:
+            iid = self.iids.get(key)
+            if iid is None:
+                return
+            vals = self.values[iid]
+            i = self.columns.index(column)
+            if vals[i] != value:
+                vals[i] = value
+                self.dirty.add(iid)
+
+    def set_all(self, column, value):
+        with self.lock:
+            i = self.columns.index(column)
+            for iid, vals in self.values.items():
+                if vals[i] != value:
+                    vals[i] = value
+                    self.dirty.add(iid)
+
+    def _tick(self):
+        self.flush()
+        self.tree.after(self.interval_ms, self._tick)
+
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            rows = [(iid, tuple(self.values[iid])) for iid in self.dirty]
+            self.dirty.clear()
+        for iid, vals in rows:
+            self.tree.item(iid, values=vals)
+
+
+class FileRecord:
+    """Per-file GUI state. Slots keep large folder listings compact."""
+    __slots__ = ("path", "use", "priority", "pinned")
+
+    def __init__(self, path):
+        self.path = path
+        self.use = True
+        self.priority = 0
+        self.pinned = False
@@ -0,0 +1,92 @@
+# watch_ingest.py
+# Watch-folder auto-ingest: turns file system events into conversion jobs
+# Debounces events, waits for files to stop growing and skips duplicates / own outputs
+# Seen paths, fingerprints and outputs are kept LRU-bounded for long sessions
+
+import os
+import time
+from collections import OrderedDict
+
+from config import VIDEO_EXTS, INGEST_MEMORY_MAX
+from file_manager import file_fingerprint
+
+# A file is submitted once its size and mtime have been unchanged this long
+STABLE_SECS = 3.0
+
+
+def _remember(lru, key):
+    lru[key] = None
+    lru.move_to_end(key)
+    while len(lru) > INGEST_MEMORY_MAX:
+        lru.popitem(last=False)
+
+
+class IngestTracker:
+    def __init__(self, stable_secs=STABLE_SECS):
+        self.stable_secs = stable_secs
+        self.pending = {}        # path -> [size, mtime_ns, unchanged_since]
+        # Ordered keys used as bounded sets, oldest forgotten first
+        self.seen_paths = OrderedDict()
+        self.seen_fps = OrderedDict()
+        self.outputs = OrderedDict()
+
+    def is_ignored(self, path):
+        path = os.path.abspath(path)
+        if not path.lower().endswith(VIDEO_EXTS):
+            return True
+        if path in self.outputs:
+            return True
+        return os.path.splitext(os.path.basename(path))[0].endswith("_converted")
+
+    def add_output(self, path):
+        """Register a file we are going to write so its events are ignored."""
+        _remember(self.outputs, os.path.abspath(path))
+
+    def mark_seen(self, paths):
+        """Files already present when watching starts are not ingested."""
+        for p in paths:
+            _remember(self.seen_paths, os.path.abspath(p))
+
+    def note(self, path, now=None):
+        """Record a file system event. Each event restarts the stability timer."""
+        path = os.path.abspath(path)
+        if path in self.seen_paths or self.is_ignored(path):
+            return
+        entry = self.pending.get(path)
+        now = time.monotonic() if now is None else now
+        if entry:
+            entry[2] = now
+        else:
+            self.pending[path] = [None, None, now]
+
+    def poll(self, now=None):
+        """Return paths that became stable since the last poll."""
+        now = time.monotonic() if now is None else now
+        ready = []
+
+        for path, entry in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]      # deleted / moved away
+                continue
+
+            if (st.st_size, st.st_mtime_ns) != (entry[0], entry[1]):
+                entry[0], entry[1], entry[2] = st.st_size, st.st_mtime_ns, now
+                continue
+            if now - entry[2] < self.stable_secs:
+                continue
+
+            fp = file_fingerprint(path)
+            if fp is None:
+                entry[2] = now              # still locked by the writer, retry later
+                continue
+
+            del self.pending[path]
+            _remember(self.seen_paths, path)
+            if fp in self.seen_fps:
+                continue
+            _remember(self.seen_fps, fp)
+            ready.append(path)
+
+        return ready